@@ -1,44 +1,49 @@
 import os
+import time
 import sqlite3
 import openai
-import pandas as pd
 from dotenv import load_dotenv, find_dotenv
 import streamlit as st
 from langchain_openai import ChatOpenAI
-from langchain_community.utilities import SQLDatabase
-from langchain_experimental.sql import SQLDatabaseChain
-from langchain.prompts import PromptTemplate
 from csv_to_sqllite import csv_to_sqlite  # Import the function
 from excel_to_sqllite import excel_to_sqlite  # Function that converts an xlsx file to an sqlite file
-
-# Functions for managing conversation history
-def load_conversation_history():
-    """Load conversation history from a file."""
-    try:
-        with open(CONVERSATION_FILE_PATH, "r") as file:
-            return file.readlines()
-    except FileNotFoundError:
-        return []
-
-def save_conversation_history(user_input, bot_response):
-    """Save conversation history to a file."""
-    user_input = user_input.replace("\n", ":newligne:")
-    bot_response = bot_response.replace("\n", ":newligne:").replace("Answer:", "")
-    with open(CONVERSATION_FILE_PATH, "a") as file:
-        file.write(f"user: {user_input}\n")
-        file.write(f"BABot: {bot_response}\n")
-
-def initialize_paths(uploaded_file):
-    """Initialize file paths for the uploaded file."""
+from column_profiles import PROFILE_TABLE
+from conversion_cache import (cache_key, cache_lookup, cache_store, content_hash, partial_path, pin_entry,
+                              write_if_changed)
+from query_pipeline import answer_question, build_sql_database, execute_sql, generate_sql, stream_answer
+from sql_cache import cache_stats, lookup_sql, schema_hash, store_sql
+from index_advisor import tune_indexes
+from schema_pruning import build_schema_index, prune_schema
+from instrumentation import append_record, new_run_id, recent_records, stage, stage_summary
+from sql_guard import GUARD_METRICS
+from history_store import HISTORY_PAGE_SIZE, append_turn, load_recent_turns
+from workspaces import cleanup_workspaces, create_workspace, start_cleanup_thread, touch_workspace
+from db_connections import (MEMORY_DB_MAX_BYTES, cached_preview, cached_profiles, cached_tables,
+                            close_session_database, memory_session_database, server_engine, server_session_database,
+                            server_url_from_env, sync_session_database)
+
+def initialize_paths(uploaded_file, workspace):
+    """Initialize file paths for the uploaded file, inside the workspace of the session."""
     file_name_formatted = os.path.splitext(os.path.basename(uploaded_file.name))[0].replace(" ", "_").replace(
         "-", "_").replace(".", "_")
     if uploaded_file.name.endswith(".csv"):
-        csv_path = f"data/temp/temp_{file_name_formatted}.csv"
+        csv_path = os.path.join(workspace, f"temp_{file_name_formatted}.csv")
     elif uploaded_file.name.endswith(".xlsx"):
-        csv_path = f"data/temp/temp_{file_name_formatted}.xlsx"
-    db_path = f"data/temp/temp_{file_name_formatted}.sqlite"
+        csv_path = os.path.join(workspace, f"temp_{file_name_formatted}.xlsx")
+    db_path = os.path.join(workspace, f"temp_{file_name_formatted}.sqlite")
     return csv_path, db_path
 
+def list_tables(db_path):
+    """Return the names of the data tables of an SQLite database, without SQLite's and the profiles table."""
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite\\_%' ESCAPE '\\' "
+                       "AND name != ?;", (PROFILE_TABLE,))
+        return [table[0] for table in cursor.fetchall()]
+    finally:
+        conn.close()
+
 # Set the page configuration to wide mode
 st.set_page_config(page_title="Analysez votre base de données avec BABot_SQL", layout="wide")
 
@@ -48,7 +53,61 @@ openai.api_key = os.getenv("OPENAI_API_KEY")
 
 # Initialize LLM
 llm = ChatOpenAI(model="gpt-4o", temperature=0, openai_api_key=openai.api_key,
-    max_tokens=4000)
+    max_tokens=4000, stream_usage=True)  # stream_usage reports the tokens of streamed answers
+
+# Value of uploaded_sql when the server database of the DB_* environment variables is queried
+SERVER_DATABASE = ":server:"
+
+@st.cache_resource
+def get_server_engine(url):
+    """Pooled server engine, created once and shared by every session."""
+    return server_engine(url)
+
+def get_sql_database(session_db):
+    """
+    Build the SQLDatabase, its rendered table_info and its schema index once per session database.
+
+    They are kept in the session database rather than in a process-wide cache, because the
+    SQLDatabase holds the session's engine: they are rebuilt when the database file changes,
+    and released with the engine when the session ends. The table descriptions are rendered once,
+    see build_sql_database. The schema index ranks the tables by relevance to a question, see
+    schema_pruning.
+    """
+    if session_db["sql_database"] is None:
+        db = build_sql_database(session_db["engine"])
+        session_db["sql_database"] = (db, db.get_table_info(), build_schema_index(db, session_db["engine"]))
+    return session_db["sql_database"]
+
+def upload_digest_of(uploaded_file):
+    """
+    Return the digest of an uploaded file and whether the session sees this upload for the first time.
+
+    Streamlit gives every upload a new file_id, so the bytes are hashed once per upload rather
+    than on every rerun of the script.
+    """
+    digests = st.session_state.upload_digests
+    first_seen = uploaded_file.file_id not in digests
+    if first_seen:
+        digests[uploaded_file.file_id] = content_hash(uploaded_file.getvalue())
+    return digests[uploaded_file.file_id], first_seen
+
+def database_file():
+    """Path of the selected database file, or None for a database held in memory."""
+    if st.session_state.uploaded_sql in (":memory:", SERVER_DATABASE):
+        return None
+    return st.session_state.uploaded_sql
+
+def database_id():
+    """Identify the selected database across sessions, for the query log of the index advisor."""
+    if st.session_state.uploaded_sql == SERVER_DATABASE:
+        return st.session_state.dburi
+    return st.session_state.database_key
+
+
+@st.cache_resource
+def workspace_cleanup():
+    """Start the background removal of expired workspaces, once per process."""
+    return start_cleanup_thread()
 
 
 # Initialize session state for persistent variables
@@ -61,7 +120,35 @@ if 'uploaded_sql' not in st.session_state:
 if "table_names" not in st.session_state:
     st.session_state.table_names = []
 
-CONVERSATION_FILE_PATH = "conversation_history.txt"
+# Engine shared by the table preview, LangChain's SQLDatabase and query execution
+if "db_engine" not in st.session_state:
+    st.session_state.db_engine = None
+
+# Read-only connection of the session, with its cached table list and previews
+if "db_session" not in st.session_state:
+    st.session_state.db_session = None
+
+if "sqlite_upload" not in st.session_state:
+    st.session_state.sqlite_upload = None
+
+# Digest of every file uploaded in the session, by upload file_id
+if "upload_digests" not in st.session_state:
+    st.session_state.upload_digests = {}
+
+# Conversion cache key or upload digest of the database file, the same in every session loading it
+if "database_key" not in st.session_state:
+    st.session_state.database_key = ""
+
+# Number of pages of conversation history shown, extended on demand
+if "history_pages" not in st.session_state:
+    st.session_state.history_pages = 1
+
+# Private directory of the session for its uploads and history, so sessions never share files
+if "workspace" not in st.session_state:
+    st.session_state.workspace = create_workspace()
+touch_workspace(st.session_state.workspace)
+workspace_cleanup()
+history_db_path = os.path.join(st.session_state.workspace, "conversation_history.sqlite")
 
 if not openai.api_key:
     st.error("Clé OpenAI API Key introuvable. Veuillez vérifier votre fichier .env")
@@ -70,85 +157,180 @@ else:
 
 st.title("Analysez votre base excel/csv/sql avec BABot_SQL")
 
+# The server database of the DB_* environment variables is queried in place, without importing a file
+server_url = server_url_from_env()
+use_server_database = server_url is not None and st.checkbox(
+    f"Interroger directement la base serveur '{server_url.database}'")
+if use_server_database:
+    # One pooled engine is shared by all sessions
+    engine = get_server_engine(server_url.render_as_string(hide_password=False))
+    if st.session_state.db_session is None or st.session_state.db_session["engine"] is not engine:
+        if st.session_state.db_session is not None:
+            close_session_database(st.session_state.db_session)
+        st.session_state.db_session = server_session_database(engine)
+    st.session_state.uploaded_sql = SERVER_DATABASE
+    st.session_state.dburi = st.session_state.db_session["path"]
+elif st.session_state.uploaded_sql == SERVER_DATABASE:
+    # Back to file mode: nothing is selected until a file is loaded
+    st.session_state.uploaded_sql = ""
+    st.session_state.dburi = ""
+    st.session_state.database_key = ""
+    st.session_state.db_session = None
+    st.session_state.table_names = []
+
 # File uploader for the CSV/Excel file
 uploaded_csv_xlsx_file = st.file_uploader("Choisissez un fichier (CSV ou Excel) à analyser", type=["csv", "xlsx"])
 
-if uploaded_csv_xlsx_file is not None:
+if uploaded_csv_xlsx_file is not None and not use_server_database:
     # Initialize paths
-    csv_temp_path, db_temp_path = initialize_paths(uploaded_csv_xlsx_file)
-    # Save uploaded file temporarily
-    with open(csv_temp_path, "wb") as f:
-        f.write(uploaded_csv_xlsx_file.getbuffer())
+    csv_temp_path, db_temp_path = initialize_paths(uploaded_csv_xlsx_file, st.session_state.workspace)
+    # Save uploaded file temporarily, unless the same bytes are already there; reruns on the
+    # same upload skip both the hash and the write
+    upload_digest, new_upload = upload_digest_of(uploaded_csv_xlsx_file)
+    if new_upload or not os.path.exists(csv_temp_path):
+        write_start = time.perf_counter()
+        if write_if_changed(csv_temp_path, uploaded_csv_xlsx_file.getvalue(), upload_digest):
+            append_record({"run_id": new_run_id(), "stage": "upload_write", "started_at": time.time(),
+                           "bytes": uploaded_csv_xlsx_file.size, "seconds": time.perf_counter() - write_start})
+            cleanup_workspaces(keep=st.session_state.workspace)  # Keep all workspaces within the disk quota
 
     convert_button = st.button("Convertir CSV en base de données SQLite")
     # Button to trigger the CSV/Excel to SQLite conversion
     if convert_button:
-        # Ensure the database file is freshly created by removing any existing one
-        if os.path.exists(db_temp_path):
-            os.remove(db_temp_path)  # Delete the existing SQLite file
-
-        if uploaded_csv_xlsx_file.name.endswith(".csv"):
-            csv_to_sqlite(csv_temp_path, db_temp_path)
+        # Table names derive from the file name, so it is part of the key along with the converter
+        converter = "csv" if uploaded_csv_xlsx_file.name.endswith(".csv") else "excel"
+        conversion_key = cache_key(upload_digest, {"converter": converter, "file_name": os.path.basename(csv_temp_path)})
+        cached_db_path = cache_lookup(conversion_key)
+
+        if cached_db_path is not None:
+            append_record({"run_id": new_run_id(), "stage": "conversion", "started_at": time.time(), "seconds": 0.0,
+                           "converter": converter, "bytes": uploaded_csv_xlsx_file.size, "cache_hit": True})
+            st.success("Base de données SQLite réutilisée depuis le cache!")
         else:
-            excel_to_sqlite(csv_temp_path, db_temp_path)
-        st.success("Fichier converti en base de données SQLite avec succès!")
-
+            # Convert into a partial file, published in the cache once the conversion is done
+            converted_path = partial_path(conversion_key, st.session_state.workspace)
+            os.makedirs(os.path.dirname(converted_path), exist_ok=True)
+            if os.path.exists(converted_path):
+                os.remove(converted_path)
+
+            sheet_reports = []
+            with stage("conversion", new_run_id(), converter=converter, bytes=uploaded_csv_xlsx_file.size,
+                       cache_hit=False) as record:
+                if converter == "csv":
+                    csv_to_sqlite(csv_temp_path, converted_path, workers=os.cpu_count())
+                else:
+                    sheet_reports = excel_to_sqlite(csv_temp_path, converted_path, streaming=True,
+                                                    workers=os.cpu_count()) or []
+                    for report in sheet_reports:
+                        if report["error"]:
+                            st.warning(f"La feuille '{report['sheet']}' n'a pas pu être convertie: {report['error']}")
+                    record["rows"] = sum(report["rows"] or 0 for report in sheet_reports)
+            # The converters report errors without raising, so only databases with data tables are used
+            if not os.path.exists(converted_path) or not list_tables(converted_path):
+                st.error("Echec de la conversion du fichier en base de données SQLite.")
+                st.stop()
+            if any(report["error"] for report in sheet_reports):
+                # A partial conversion stays private to the session, so a later upload retries the failed sheets
+                os.replace(converted_path, db_temp_path)
+            else:
+                cached_db_path = cache_store(conversion_key, converted_path)
+                st.success("Fichier converti en base de données SQLite avec succès!")
+
+        if cached_db_path is not None:
+            # The session queries its own link to the cached database, which cache eviction cannot remove
+            db_temp_path = pin_entry(cached_db_path, db_temp_path)
         st.session_state.uploaded_sql = db_temp_path
         st.session_state.dburi = f"sqlite:///{db_temp_path}"
-
-        db = SQLDatabase.from_uri(st.session_state.dburi)
-        try:
-            conn = sqlite3.connect(db_temp_path)
-            cursor = conn.cursor()
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-            tables = cursor.fetchall()
-            st.session_state.table_names = [table[0] for table in tables] if tables else []
-            conn.close()
-        except Exception as e:
-            st.error(f"Erreur lors de la lecture de la base de données: {e}")
+        st.session_state.database_key = conversion_key
 
 # File uploader for SQLite database
 uploaded_sqlite_file = st.file_uploader("Ou choisissez une base de données SQLite à analyser", type="sqlite")
 
-if uploaded_sqlite_file is not None:
-    temp_db_path = "data/temp/temp_uploaded_db.sqlite"
-
-    # Ensure any existing SQLite file is removed before saving the new one
-    if os.path.exists(temp_db_path):
-        try:
-            os.remove(temp_db_path)
-        except Exception as e:
-            st.error(f"Erreur lors de la suppression de l'ancien fichier SQLite: {e}")
-            st.stop()  # Stop execution if the file can't be removed
+if uploaded_sqlite_file is not None and not use_server_database:
+    upload_digest, _ = upload_digest_of(uploaded_sqlite_file)
+
+    # The database is only loaded again when a different file is uploaded
+    if st.session_state.sqlite_upload is None or st.session_state.sqlite_upload["digest"] != upload_digest:
+        if st.session_state.db_session is not None:
+            close_session_database(st.session_state.db_session)  # Release the previous database
+            st.session_state.db_session = None
+        if uploaded_sqlite_file.size <= MEMORY_DB_MAX_BYTES:
+            # Small and medium databases are queried straight from RAM, without a disk round trip
+            sqlite_upload = {
+                "digest": upload_digest,
+                "uploaded_sql": ":memory:",
+                "dburi": "sqlite://",
+            }
+        else:
+            temp_db_path = os.path.join(st.session_state.workspace, "temp_uploaded_db.sqlite")
+
+            # Ensure any existing SQLite file is removed before saving the new one
+            if os.path.exists(temp_db_path):
+                try:
+                    os.remove(temp_db_path)
+                except Exception as e:
+                    st.error(f"Erreur lors de la suppression de l'ancien fichier SQLite: {e}")
+                    st.stop()  # Stop execution if the file can't be removed
+
+            with open(temp_db_path, "wb") as f:
+                f.write(uploaded_sqlite_file.getvalue())
+            cleanup_workspaces(keep=st.session_state.workspace)
+            sqlite_upload = {
+                "digest": upload_digest,
+                "uploaded_sql": temp_db_path,
+                "dburi": f"sqlite:///{temp_db_path}",
+            }
+        st.session_state.sqlite_upload = sqlite_upload
 
-    with open(temp_db_path, "wb") as f:
-        f.write(uploaded_sqlite_file.getvalue())
     st.success("Fichier SQLite ajouté avec succès!")
-    st.session_state.uploaded_sql = temp_db_path
-    st.session_state.dburi = f"sqlite:///{temp_db_path}"
-
+    st.session_state.uploaded_sql = st.session_state.sqlite_upload["uploaded_sql"]
+    st.session_state.dburi = st.session_state.sqlite_upload["dburi"]
+    st.session_state.database_key = st.session_state.sqlite_upload["digest"]
+
+    # The in-memory database is only loaded again when a different file is uploaded
+    db_session = st.session_state.db_session
+    if st.session_state.uploaded_sql == ":memory:" and (db_session is None or db_session["fingerprint"] != upload_digest):
+        if db_session is not None:
+            close_session_database(db_session)
+        st.session_state.db_session = memory_session_database(uploaded_sqlite_file.getvalue(), upload_digest)
+
+# A database file removed in the meantime (workspace or cache eviction) must be loaded again
+if (st.session_state.uploaded_sql and st.session_state.uploaded_sql not in (":memory:", SERVER_DATABASE)
+        and not os.path.exists(st.session_state.uploaded_sql)):
+    st.warning("La base de données n'est plus disponible, veuillez recharger le fichier.")
+    if st.session_state.db_session is not None:
+        close_session_database(st.session_state.db_session)
+    st.session_state.update(uploaded_sql="", dburi="", database_key="", db_session=None, sqlite_upload=None,
+                            table_names=[])
+
+# A database file keeps its read-only connection across reruns until the file changes
+if st.session_state.uploaded_sql and st.session_state.uploaded_sql not in (":memory:", SERVER_DATABASE):
+    st.session_state.db_session = sync_session_database(st.session_state.db_session, st.session_state.uploaded_sql)
+
+if st.session_state.db_session is not None:
+    st.session_state.db_engine = st.session_state.db_session["engine"]
     try:
-        conn = sqlite3.connect(temp_db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        tables = cursor.fetchall()
-        st.session_state.table_names = [table[0] for table in tables] if tables else []
-        conn.close()
+        st.session_state.table_names = cached_tables(st.session_state.db_session)
     except Exception as e:
         st.error(f"Erreur lors de la lecture de la base de données: {e}")
 
 # Display tables
 if st.session_state.table_names:
     selected_table = st.selectbox("Sélectionnez une table à afficher:", st.session_state.table_names)
-    conn = sqlite3.connect(st.session_state.uploaded_sql)
-    df = pd.read_sql_query(f"SELECT * FROM {selected_table} LIMIT 5", conn)
+    df = cached_preview(st.session_state.db_session, selected_table)
     st.write(f"Affichage des 5 premières lignes de la table '{selected_table}':")
     st.dataframe(df)
-    conn.close()
+    # Profiles computed at conversion time; databases imported as is have none
+    profiles = cached_profiles(st.session_state.db_session, selected_table)
+    if not profiles.empty:
+        with st.expander(f"Profil des colonnes de la table '{selected_table}'"):
+            st.dataframe(profiles)
 
 # Input field for the user query
 st.subheader("Votre requête personnalisée sous forme de question")
 user_query = st.text_input("Posez votre question", placeholder="Exemple: Quel est le nombre total de ventes?")
+bypass_sql_cache = st.checkbox("Régénérer la requête SQL (ignorer le cache)")
+stream_answers = st.checkbox("Afficher la réponse au fur et à mesure", value=True)
 query_button = st.button("Exécuter requête")
 
 if query_button:
@@ -156,64 +338,78 @@ if query_button:
         st.warning("Aucune base de données sélectionnée.")
     else:
         with st.spinner("En cours d'exécution..."):
+            # Every stage of the question is timed and logged under the same run id
+            run_id = new_run_id()
             try:
-                db = SQLDatabase.from_uri(st.session_state.dburi)
-                db_chain = SQLDatabaseChain.from_llm(
-                    llm=llm,
-                    db=db,
-                    verbose=True,
-                    prompt=PromptTemplate(
-                        input_variables=["input", "table_info"],
-                        template=(
-                            "You are a highly skilled SQL expert tasked with answering questions using database information. "
-                            "Given the user's question: '{input}' and the database schema details: '{table_info}', follow these precise instructions:\n\n"
-                            "1. **Generate the most appropriate SQL query** to answer the user's question based on the given schema. Ensure the query is optimized and accurate.\n"
-                            "2. Handle errors gracefully, providing actionable suggestions if needed.\n"
-                            "3. **Do not include any Markdown formatting** at the beginning and end of the sql query (e.g., ```sql).\n"
-                            "4. Use double quotes for any column or table names that contain special characters or spaces.\n"
-                            "5. Do not provide any explanations. Just the SQL query code.\n"
-                            "6. ** Remove all Markdown formatting ** at the beginning and end of the sql query (e.g., ```sql).\n"
-                        )
-                    )
-                )
-
-                query = db_chain.invoke(user_query)
-
-                conn = sqlite3.connect(st.session_state.dburi.split("sqlite:///")[1])  # Extract file path
-                result = pd.read_sql_query(query['result'], conn)
-
-                conn.close()
-
-                result_prompt = PromptTemplate(
-                    input_variables=["input", "query_result"],
-                    template=(
-                        "You are a highly skilled SQL expert tasked with answering questions using database information. "
-                        "Given the user's question: '{input}' and the query result: '{query_result}', follow these precise instructions:\n\n"
-                        "1. **Generate the answer in French** based on the user's question and the query result.\n"
-                        "2. Make sure the answer is always in proper French and reflects the query result.\n"
-                    )
-                )
-
-                # Step 3: Format the prompt with the user input and query result
-                formatted_prompt = result_prompt.format(
-                    input=user_query,
-                    query_result=result.to_string(index=False)
-                )
-                response = llm.invoke(formatted_prompt)
-                # Access only the 'content' part of the response
-                french_response = response.content if hasattr(response, "content") else response.get("content", response)
-                # Step 5: Display the result in French
-                st.write(french_response)
-
-                save_conversation_history(user_query, french_response)
+                with stage("schema_reflection", run_id):
+                    db, table_info, schema_index = get_sql_database(st.session_state.db_session)
+                with stage("schema_pruning", run_id) as record:
+                    # Only the tables relevant to the question are described to the LLM
+                    table_info = prune_schema(db, schema_index, user_query, record=record)
+                with stage("sql_generation", run_id) as record:
+                    # A question already answered on this schema skips SQL generation entirely
+                    schema_digest = schema_hash(table_info)
+                    generated_sql = None if bypass_sql_cache else lookup_sql(user_query, schema_digest)
+                    sql_from_cache = generated_sql is not None
+                    record["cache_hit"] = sql_from_cache
+                    if not sql_from_cache:
+                        generated_sql = generate_sql(llm, user_query, table_info, metrics=record)
+
+                with stage("sql_execution", run_id) as record:
+                    result, truncated = execute_sql(generated_sql, st.session_state.db_engine)
+                    record["rows"] = len(result)
+                    record["truncated"] = truncated
+                if truncated:
+                    st.warning(f"Résultat tronqué aux {len(result)} premières lignes.")
+                # Only SQL that executed successfully is cached
+                if not sql_from_cache:
+                    store_sql(user_query, schema_digest, generated_sql)
+                # Step 5: Display the result in French, token by token in streaming mode
+                with stage("answer", run_id, streamed=stream_answers) as record:
+                    record["rows"] = len(result)
+                    if stream_answers:
+                        french_response = st.write_stream(stream_answer(llm, user_query, result, truncated, metrics=record))
+                    else:
+                        french_response = answer_question(llm, user_query, result, truncated, metrics=record)
+                        st.write(french_response)
+                stats = cache_stats()
+                st.caption(f"Requête SQL {'issue du cache' if sql_from_cache else 'générée'} "
+                           f"(cache: {stats['hits']} succès, {stats['misses']} échecs, {stats['entries']} entrées)")
+
+                append_turn(user_query, french_response, db_path=history_db_path)
             except Exception as e:
                 st.error(f"Echec de l'exécution: {e}")
-
-# Display conversation history
-st.session_state.conversation_history = load_conversation_history()
-for item in reversed(st.session_state.conversation_history):
-    item_display = item.replace(":newligne:", "\n")
-    if "user" in item:
-        st.info(item_display.replace("user: ", ""))
-    elif "BABot" in item:
-        st.success(item_display.replace("BABot: ", ""))
+            else:
+                # Columns the workload keeps filtering, joining or grouping on get indexed, once the
+                # answer is shown and saved; indexing is an optimization, so its errors are only logged
+                try:
+                    with stage("index_tuning", run_id) as record:
+                        created_indexes = tune_indexes(database_id(), generated_sql, st.session_state.db_engine,
+                                                       database_file())
+                        record["indexes_created"] = len(created_indexes)
+                    for table, columns in created_indexes:
+                        st.caption(f"Index créé sur {table} ({', '.join(columns)})")
+                except Exception as e:
+                    print(f"Index tuning failed: {e}")
+
+# Per-stage timings, tokens and cache hits of the recent questions and uploads
+with st.expander("Mesures de performance"):
+    summary = stage_summary(recent_records())
+    if summary.empty:
+        st.write("Aucune mesure enregistrée.")
+    else:
+        st.dataframe(summary)
+    st.caption("Garde-fous SQL depuis le démarrage: "
+               f"{GUARD_METRICS['rejected_plans']} requêtes refusées, {GUARD_METRICS['timeouts']} délais dépassés, "
+               f"{GUARD_METRICS['cancellations']} annulations, {GUARD_METRICS['truncations']} résultats tronqués")
+
+# Display conversation history, most recent turns first, one page at a time
+history_limit = HISTORY_PAGE_SIZE * st.session_state.history_pages
+# One extra turn is loaded to know whether older turns remain
+history_turns = load_recent_turns(history_limit + 1, history_db_path)
+for _, question, answer in history_turns[:history_limit]:
+    st.success(answer)
+    st.info(question)
+if len(history_turns) > history_limit and st.button("Afficher plus d'historique"):
+    st.session_state.history_pages += 1
+    st.rerun()
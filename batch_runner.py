@@ -0,0 +1,190 @@
+"""
+Answer a list of questions against a database without the Streamlit app.
+
+Usage:
+
+    python batch_runner.py questions.txt --db data/ventes_2024_09.sqlite --output answers.csv
+    python batch_runner.py questions.csv --server --output answers.jsonl --concurrency 16
+
+The question file holds one question per line, or a CSV file with a `question` column. The
+LLM calls run concurrently with asyncio, at most `--concurrency` at a time, and are retried
+with exponential backoff when the API is rate limited or unavailable. The SQL runs in a thread
+pool. The same prompts, schema pruning, SQL cache, guarded executor and instrumentation as the
+app are used.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import openai
+from dotenv import find_dotenv, load_dotenv
+from langchain_openai import ChatOpenAI
+
+from db_connections import read_only_engine, server_engine, server_url_from_env
+from instrumentation import append_record, new_run_id, stage
+from query_pipeline import aanswer_question, agenerate_sql, build_sql_database, execute_sql
+from schema_pruning import build_schema_index, prune_schema
+from sql_cache import lookup_sql, schema_hash, store_sql
+
+# Number of LLM calls in flight at the same time
+DEFAULT_CONCURRENCY = 8
+
+# Attempts of an LLM call before the question is reported as failed
+DEFAULT_RETRIES = 5
+
+# First backoff delay in seconds, doubled after every failed attempt
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+
+# API errors worth retrying; other errors fail the question immediately
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+# Columns of the output file
+OUTPUT_FIELDS = ["index", "question", "sql", "sql_from_cache", "rows", "truncated", "answer", "error", "seconds"]
+
+
+def read_questions(path):
+    """Read the questions of a text file (one per line) or of a CSV file with a `question` column."""
+    with open(path, encoding="utf-8") as file:
+        if path.lower().endswith(".csv"):
+            return [row["question"].strip() for row in csv.DictReader(file) if row["question"].strip()]
+        return [line.strip() for line in file if line.strip()]
+
+
+async def with_retries(call, retries=DEFAULT_RETRIES):
+    """
+    Await `call()` until it succeeds, sleeping with exponential backoff and jitter after
+    every retryable API error. `call()` is attempted at least once.
+    """
+    retries = max(1, retries)
+    for attempt in range(retries):
+        try:
+            return await call()
+        except RETRYABLE_ERRORS:
+            if attempt == retries - 1:
+                raise
+            delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt)
+            await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+
+
+async def answer_one(index, question, llm, engine, db, schema_index, semaphore, sql_pool, use_cache, retries):
+    """Generate, execute and answer one question; errors are reported in the returned row."""
+    loop = asyncio.get_running_loop()
+    run_id = new_run_id()
+    row = {"index": index, "question": question, "sql": None, "sql_from_cache": False, "rows": None,
+           "truncated": False, "answer": None, "error": None}
+    start = time.perf_counter()
+    try:
+        with stage("schema_pruning", run_id, batch=True) as record:
+            table_info = prune_schema(db, schema_index, question, record=record)
+
+        schema_digest = schema_hash(table_info)
+        sql = lookup_sql(question, schema_digest) if use_cache else None
+        row["sql_from_cache"] = sql is not None
+        if sql is None:
+            async with semaphore:
+                # Timed once a slot is free, so that waiting for the other questions is not counted
+                with stage("sql_generation", run_id, batch=True, cache_hit=False) as record:
+                    sql = await with_retries(lambda: agenerate_sql(llm, question, table_info, metrics=record), retries)
+        else:
+            append_record({"run_id": run_id, "stage": "sql_generation", "started_at": time.time(), "seconds": 0.0,
+                           "batch": True, "cache_hit": True})
+        row["sql"] = sql
+
+        with stage("sql_execution", run_id, batch=True) as record:
+            result, truncated = await loop.run_in_executor(sql_pool, execute_sql, sql, engine)
+            row["rows"] = record["rows"] = len(result)
+            row["truncated"] = record["truncated"] = truncated
+        if not row["sql_from_cache"]:
+            store_sql(question, schema_digest, sql)
+
+        async with semaphore:
+            with stage("answer", run_id, batch=True) as record:
+                row["answer"] = await with_retries(
+                    lambda: aanswer_question(llm, question, result, truncated, metrics=record), retries)
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+    row["seconds"] = round(time.perf_counter() - start, 3)
+    print(f"[{index + 1}] {'ERREUR' if row['error'] else 'OK'} {question}")
+    return row
+
+
+async def run_batch(questions, llm, engine, concurrency=DEFAULT_CONCURRENCY, sql_workers=None,
+                    use_cache=True, retries=DEFAULT_RETRIES):
+    """
+    Answer every question, keeping at most `concurrency` LLM calls in flight.
+
+    Returns:
+        list: One result row per question, in the order of `questions`.
+    """
+    # The table descriptions are rendered once and pruned per question
+    db = build_sql_database(engine)
+    schema_index = build_schema_index(db, engine)
+    semaphore = asyncio.Semaphore(concurrency)
+    with ThreadPoolExecutor(max_workers=sql_workers or os.cpu_count()) as sql_pool:
+        return await asyncio.gather(*(
+            answer_one(index, question, llm, engine, db, schema_index, semaphore, sql_pool, use_cache, retries)
+            for index, question in enumerate(questions)
+        ))
+
+
+def write_results(rows, path):
+    """Write the result rows to a JSON Lines file (.jsonl) or otherwise to a CSV file."""
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        if path.lower().endswith(".jsonl"):
+            for row in rows:
+                file.write(json.dumps(row, ensure_ascii=False) + "\n")
+        else:
+            writer = csv.DictWriter(file, fieldnames=OUTPUT_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Answer a list of questions against a database.")
+    parser.add_argument("questions", help="Text file with one question per line, or CSV file with a 'question' column.")
+    database = parser.add_mutually_exclusive_group(required=True)
+    database.add_argument("--db", help="SQLite database to question.")
+    database.add_argument("--server", action="store_true", help="Question the server database of the DB_* variables.")
+    parser.add_argument("--output", default="answers.csv", help="Result file, .csv or .jsonl.")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="LLM calls in flight at most.")
+    parser.add_argument("--sql-workers", type=int, default=None, help="Threads executing the SQL queries.")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES, help="Attempts per LLM call.")
+    parser.add_argument("--model", default="gpt-4o", help="OpenAI chat model.")
+    parser.add_argument("--no-cache", action="store_true", help="Regenerate the SQL of every question.")
+    args = parser.parse_args(argv)
+    if args.retries < 1:
+        parser.error("--retries must be at least 1")
+
+    load_dotenv(find_dotenv())
+    if args.server:
+        if server_url_from_env() is None:
+            parser.error("DB_TYPE and DB_HOSTNAME must be set to use --server")
+        engine = server_engine(server_url_from_env())
+    else:
+        engine = read_only_engine(args.db, pool_size=args.sql_workers or os.cpu_count())
+
+    # Retries are handled here, with backoff shared by the whole batch
+    llm = ChatOpenAI(model=args.model, temperature=0, max_tokens=4000, max_retries=0)
+    questions = read_questions(args.questions)
+    start = time.perf_counter()
+    rows = asyncio.run(run_batch(questions, llm, engine, args.concurrency, args.sql_workers,
+                                 not args.no_cache, args.retries))
+    write_results(rows, args.output)
+    failed = sum(1 for row in rows if row["error"])
+    print(f"{len(rows)} questions answered in {time.perf_counter() - start:.1f}s "
+          f"({failed} errors), results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import csv
+import random
+from datetime import date, datetime, timedelta
+
+from openpyxl import Workbook
+
+# Share of each kind of column in the generated files
+DEFAULT_TYPE_MIX = {"integer": 3, "real": 3, "text": 3, "date": 1, "datetime": 1, "boolean": 1}
+
+# Share of empty cells in every column
+EMPTY_CELL_RATE = 0.02
+
+# Words used for text values and column names
+WORDS = ["arbre", "platane", "marronnier", "tilleul", "érable", "jardin", "rue", "avenue", "square", "quai",
+         "nord", "sud", "est", "ouest", "grand", "petit", "vieux", "jeune", "Paris", "Lyon"]
+
+# Headers of a semicolon-delimited open data export such as p2-arbres-fr.csv
+FRENCH_HEADERS = ["IDBASE", "TYPE EMPLACEMENT", "DOMANIALITE", "ARRONDISSEMENT", "COMPLEMENT ADRESSE", "NUMERO",
+                  "LIEU / ADRESSE", "IDEMPLACEMENT", "LIBELLE FRANCAIS", "GENRE", "ESPECE", "VARIETE OUCULTIVAR",
+                  "CIRCONFERENCE (cm)", "HAUTEUR (m)", "STADE DE DEVELOPPEMENT", "REMARQUABLE", "geo_point_2d"]
+
+
+def column_kinds(columns, type_mix=None, seed=0):
+    """Draw the kind of each column from the weights of `type_mix`."""
+    type_mix = type_mix or DEFAULT_TYPE_MIX
+    rng = random.Random(seed)
+    kinds = list(type_mix)
+    return [rng.choices(kinds, weights=[type_mix[kind] for kind in kinds])[0] for _ in range(columns)]
+
+
+def random_value(rng, kind, french=False):
+    """Random cell value of a column kind, as Python data."""
+    if rng.random() < EMPTY_CELL_RATE:
+        return None
+    if kind == "integer":
+        return rng.randint(-100000, 100000)
+    if kind == "real":
+        return round(rng.uniform(-10000, 10000), 3)
+    if kind == "text":
+        return " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4)))
+    if kind == "date":
+        return date(2020, 1, 1) + timedelta(days=rng.randint(0, 2000))
+    if kind == "datetime":
+        return datetime(2020, 1, 1) + timedelta(seconds=rng.randint(0, 2000 * 86400))
+    if kind == "boolean":
+        return rng.choice(["oui", "non"] if french else ["true", "false"])
+    raise ValueError(f"Unknown column kind: {kind}")
+
+
+def format_csv_value(value, french=False):
+    """Render a value as a CSV cell; French exports use decimal commas and dd/mm/yyyy dates."""
+    if value is None:
+        return ""
+    if french and isinstance(value, float):
+        return str(value).replace(".", ",")
+    if french and isinstance(value, datetime):
+        return value.strftime("%d/%m/%Y %H:%M:%S")
+    if french and isinstance(value, date):
+        return value.strftime("%d/%m/%Y")
+    return str(value)
+
+
+def generate_csv(path, rows, columns=10, type_mix=None, delimiter=",", french=False, seed=0):
+    """
+    Write a synthetic CSV file.
+
+    Args:
+        path (str): File to write.
+        rows (int): Number of data rows.
+        columns (int): Number of columns.
+        type_mix (dict): Column kind -> weight; see DEFAULT_TYPE_MIX.
+        delimiter (str): Field delimiter.
+        french (bool): Write a French-style export: accented headers with spaces, decimal commas,
+            dd/mm/yyyy dates and oui/non booleans.
+        seed (int): Seed of the random generator, for reproducible files.
+
+    Returns:
+        list: The kind of each column.
+    """
+    rng = random.Random(seed)
+    kinds = column_kinds(columns, type_mix, seed)
+    if french:
+        headers = [FRENCH_HEADERS[i % len(FRENCH_HEADERS)] + (f" {i // len(FRENCH_HEADERS)}" if i >= len(FRENCH_HEADERS) else "")
+                   for i in range(columns)]
+    else:
+        headers = [f"col_{i}_{kind}" for i, kind in enumerate(kinds)]
+
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file, delimiter=delimiter)
+        writer.writerow(headers)
+        for _ in range(rows):
+            writer.writerow([format_csv_value(random_value(rng, kind, french), french) for kind in kinds])
+    return kinds
+
+
+def generate_french_csv(path, rows, columns=len(FRENCH_HEADERS), seed=0):
+    """Write a semicolon-delimited French-style export, like p2-arbres-fr.csv."""
+    return generate_csv(path, rows, columns, delimiter=";", french=True, seed=seed)
+
+
+def generate_quoted_csv(path, rows, seed=0):
+    """
+    Write a CSV file whose text column mixes quoted multi-line fields with literal quotes inside
+    unquoted fields (such as `tube 5" acier`), which the csv module reads as plain characters.
+
+    Returns:
+        list: The kind of each column.
+    """
+    rng = random.Random(seed)
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        file.write("id,libelle,prix\n")
+        for index in range(rows):
+            draw = rng.random()
+            if draw < 0.01:
+                label = f'tube {rng.randint(1, 9)}" acier'  # Unquoted field with a literal quote
+            elif draw < 0.05:
+                label = '"' + f'{rng.choice(WORDS)}\n{rng.choice(WORDS)} ""{rng.choice(WORDS)}"""'
+            else:
+                label = rng.choice(WORDS)
+            file.write(f"{index},{label},{round(rng.uniform(0, 1000), 2)}\n")
+    return ["integer", "text", "real"]
+
+
+def generate_xlsx(path, rows, columns=10, sheets=1, type_mix=None, seed=0):
+    """
+    Write a synthetic workbook with `sheets` sheets of `rows` rows each.
+
+    Returns:
+        list: The kind of each column, the same in every sheet.
+    """
+    rng = random.Random(seed)
+    kinds = column_kinds(columns, type_mix, seed)
+    # Write-only mode streams the rows to disk instead of building the workbook in memory
+    workbook = Workbook(write_only=True)
+    for sheet_index in range(sheets):
+        sheet = workbook.create_sheet(f"Feuille{sheet_index + 1}")
+        sheet.append([f"col_{i}_{kind}" for i, kind in enumerate(kinds)])
+        for _ in range(rows):
+            sheet.append([random_value(rng, kind) for kind in kinds])
+    workbook.save(path)
+    return kinds
@@ -0,0 +1,367 @@
+"""
+Offline benchmarks of the ingestion, history and question-answering hot paths.
+
+Run from the repository root:
+
+    python -m benchmarks.run_benchmarks                  # run every case, compare with the baselines
+    python -m benchmarks.run_benchmarks --scale 0.1      # smaller inputs for a quick check
+    python -m benchmarks.run_benchmarks --save-baseline  # record the results as the new baselines
+
+Each case runs in its own process so that its peak RSS is measured alone. The exit status is 1
+when a case failed, or when a metric regressed by more than the tolerance compared with the saved
+baseline.
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; peak RSS is then not reported
+    resource = None
+
+from benchmarks.generators import generate_csv, generate_french_csv, generate_quoted_csv, generate_xlsx
+from benchmarks.stub_llm import StubLLM
+
+# Saved results the new runs are compared with
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+# Relative change of a metric tolerated before it is reported as a regression
+DEFAULT_TOLERANCE = 0.2
+
+# Metrics where a larger value is better; for every other metric a smaller value is better
+HIGHER_IS_BETTER = {"rows_per_sec"}
+
+# Rows generated for each case at scale 1
+CSV_ROWS = 200000
+PARALLEL_CSV_ROWS = 400000
+QUOTED_CSV_ROWS = 100000
+XLSX_ROWS = 50000
+INFER_ROWS = 50000
+HISTORY_TURNS = 10000
+RESULT_ROWS = 200000
+
+# Questions of the question-flow case and the SQL the stub LLM answers them with
+QUESTIONS = {
+    "Combien de lignes contient la table?": "SELECT COUNT(*) FROM bench",
+    "Quelle est la somme de la première colonne numérique?": "SELECT SUM(col_0_integer) FROM bench",
+    "Donne les 20 premières lignes": "SELECT * FROM bench LIMIT 20",
+    "Liste toutes les lignes": "SELECT * FROM bench",
+}
+
+
+def quiet(function, *args, **kwargs):
+    """Call a function with its prints silenced."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return function(*args, **kwargs)
+
+
+def percentile(values, fraction):
+    """Value below which `fraction` of the values fall."""
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def check_row_count(db_path, expected_rows):
+    """Fail the case when a converter reported an error instead of loading every row."""
+    from column_profiles import PROFILE_TABLE
+
+    conn = sqlite3.connect(db_path)
+    try:
+        tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' "
+                                                 "AND name != ?", (PROFILE_TABLE,))]
+        rows = sum(conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0] for table in tables)
+    finally:
+        conn.close()
+    if rows != expected_rows:
+        raise RuntimeError(f"{db_path} holds {rows} rows instead of {expected_rows}")
+
+
+def bench_csv_serial(workdir, scale):
+    from csv_to_sqllite import csv_to_sqlite
+    rows = int(CSV_ROWS * scale)
+    csv_path = os.path.join(workdir, "bench.csv")
+    generate_csv(csv_path, rows)
+    start = time.perf_counter()
+    quiet(csv_to_sqlite, csv_path, os.path.join(workdir, "bench.sqlite"))
+    seconds = time.perf_counter() - start
+    check_row_count(os.path.join(workdir, "bench.sqlite"), rows)
+    return {"seconds": seconds, "rows_per_sec": rows / seconds}
+
+
+def bench_csv_parallel(workdir, scale):
+    import csv_to_sqllite
+    rows = int(PARALLEL_CSV_ROWS * scale)
+    csv_path = os.path.join(workdir, "bench.csv")
+    generate_csv(csv_path, rows)
+    # The case runs in its own process, so lowering the threshold makes any scale take the parallel path
+    csv_to_sqllite.PARALLEL_MIN_BYTES = 0
+    output = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        csv_to_sqllite.csv_to_sqlite(csv_path, os.path.join(workdir, "bench.sqlite"), workers=max(2, os.cpu_count()))
+    seconds = time.perf_counter() - start
+    if "Parsing in parallel" not in output.getvalue():
+        raise RuntimeError("the CSV file was parsed serially")
+    check_row_count(os.path.join(workdir, "bench.sqlite"), rows)
+    return {"seconds": seconds, "rows_per_sec": rows / seconds}
+
+
+def bench_csv_split_quotes(workdir, scale):
+    """Split a file with stray quotes into small ranges and check they parse like the serial reader."""
+    from csv_to_sqllite import parse_csv_range, split_csv_ranges
+    rows = int(QUOTED_CSV_ROWS * scale)
+    csv_path = os.path.join(workdir, "quotes.csv")
+    kinds = generate_quoted_csv(csv_path, rows)
+    start = time.perf_counter()
+    ranges = split_csv_ranges(csv_path, range_bytes=16 * 1024)
+    seconds = time.perf_counter() - start
+    parsed_rows = 0
+    for range_start, range_end in ranges:
+        chunk, chunk_types = parse_csv_range(csv_path, range_start, range_end, "utf-8", ",", len(kinds))
+        parsed_rows += len(chunk)
+        if chunk_types[0] != "INTEGER":
+            raise RuntimeError(f"range {range_start}-{range_end} does not start on a record boundary")
+    if parsed_rows != rows:
+        raise RuntimeError(f"the ranges hold {parsed_rows} records instead of {rows}")
+    return {"seconds": seconds, "rows_per_sec": rows / seconds}
+
+
+def bench_csv_french(workdir, scale):
+    from csv_to_sqllite import csv_to_sqlite
+    rows = int(CSV_ROWS * scale)
+    csv_path = os.path.join(workdir, "arbres.csv")
+    generate_french_csv(csv_path, rows)
+    start = time.perf_counter()
+    quiet(csv_to_sqlite, csv_path, os.path.join(workdir, "arbres.sqlite"), delimiter=";")
+    seconds = time.perf_counter() - start
+    check_row_count(os.path.join(workdir, "arbres.sqlite"), rows)
+    return {"seconds": seconds, "rows_per_sec": rows / seconds}
+
+
+def bench_infer_types(workdir, scale):
+    import csv
+    from csv_to_sqllite import infer_chunk_types
+    rows = int(INFER_ROWS * scale)
+    csv_path = os.path.join(workdir, "bench.csv")
+    generate_csv(csv_path, rows)
+    with open(csv_path, newline="", encoding="utf-8") as file:
+        data = list(csv.reader(file))[1:]
+    start = time.perf_counter()
+    infer_chunk_types(data)
+    seconds = time.perf_counter() - start
+    return {"seconds": seconds, "rows_per_sec": rows / seconds}
+
+
+def bench_excel(workdir, scale, streaming, type_mix=None):
+    from excel_to_sqllite import excel_to_sqlite
+    rows = int(XLSX_ROWS * scale)
+    xlsx_path = os.path.join(workdir, "bench.xlsx")
+    generate_xlsx(xlsx_path, rows, sheets=2, type_mix=type_mix)
+    start = time.perf_counter()
+    quiet(excel_to_sqlite, xlsx_path, os.path.join(workdir, "bench.sqlite"), streaming=streaming)
+    seconds = time.perf_counter() - start
+    check_row_count(os.path.join(workdir, "bench.sqlite"), 2 * rows)
+    return {"seconds": seconds, "rows_per_sec": 2 * rows / seconds}
+
+
+def bench_excel_streaming(workdir, scale):
+    return bench_excel(workdir, scale, streaming=True)
+
+
+def bench_excel_pandas(workdir, scale):
+    # The pandas path binds DataFrame values as they are, and sqlite3 cannot bind pandas Timestamps
+    return bench_excel(workdir, scale, streaming=False, type_mix={"integer": 3, "real": 3, "text": 3, "boolean": 1})
+
+
+def bench_history_load(workdir, scale):
+    from history_store import HISTORY_PAGE_SIZE, connect, load_recent_turns
+    db_path = os.path.join(workdir, "history.sqlite")
+    conn = connect(db_path)
+    turns = int(HISTORY_TURNS * scale)
+    conn.executemany(
+        "INSERT INTO conversation_history (created_at, question, answer) VALUES (?, ?, ?)",
+        [(i, f"Question {i}?", f"Réponse {i}. " * 20) for i in range(turns)],
+    )
+    conn.commit()
+    conn.close()
+
+    latencies = []
+    for _ in range(100):
+        start = time.perf_counter()
+        load_recent_turns(HISTORY_PAGE_SIZE, db_path)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {"p50_latency_ms": statistics.median(latencies), "p95_latency_ms": percentile(latencies, 0.95)}
+
+
+def bench_result_compaction(workdir, scale):
+    """Compact a joined result whose columns share names, as `SELECT a.*, b.*` returns."""
+    import pandas as pd
+    from result_compaction import compact_result
+    rows = int(RESULT_ROWS * scale)
+    conn = sqlite3.connect(os.path.join(workdir, "join.sqlite"))
+    conn.execute("CREATE TABLE a (id INTEGER, nom TEXT)")
+    conn.execute("CREATE TABLE b (id INTEGER, nom TEXT, prix REAL)")
+    conn.executemany("INSERT INTO a VALUES (?, ?)", [(i, f"a{i % 100}") for i in range(rows)])
+    conn.executemany("INSERT INTO b VALUES (?, ?, ?)", [(i, f"b{i % 50}", i / 10) for i in range(rows)])
+    result = pd.read_sql("SELECT a.id, a.nom, b.id, b.nom, b.prix FROM a JOIN b ON a.id = b.id", conn)
+    conn.close()
+
+    start = time.perf_counter()
+    text = compact_result(result)
+    seconds = time.perf_counter() - start
+    summarized = [line.split(":")[0] for line in text.split(f"Summary of all {rows} rows:\n")[1].splitlines()[1:]]
+    if summarized != list(result.columns):
+        raise RuntimeError(f"summarized columns {summarized} instead of {list(result.columns)}")
+    return {"seconds": seconds, "rows_per_sec": rows / seconds}
+
+
+def bench_question_flow(workdir, scale):
+    from langchain_community.utilities import SQLDatabase
+    from csv_to_sqllite import csv_to_sqlite
+    from db_connections import file_engine
+    from query_pipeline import answer_question, execute_sql, generate_sql
+
+    csv_path = os.path.join(workdir, "bench.csv")
+    db_path = os.path.join(workdir, "bench.sqlite")
+    generate_csv(csv_path, int(CSV_ROWS * scale), type_mix={"integer": 1, "real": 1, "text": 1}, seed=1)
+    quiet(csv_to_sqlite, csv_path, db_path)
+    engine = file_engine(db_path)
+    table_info = SQLDatabase(engine).get_table_info()
+    llm = StubLLM(sql_answers=QUESTIONS)
+
+    latencies = []
+    for _ in range(5):
+        for question in QUESTIONS:
+            start = time.perf_counter()
+            sql = generate_sql(llm, question, table_info)
+            result, truncated = execute_sql(sql, engine)
+            answer_question(llm, question, result, truncated)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return {
+        "p50_latency_ms": statistics.median(latencies),
+        "p95_latency_ms": percentile(latencies, 0.95),
+        "prompt_chars_per_question": llm.prompt_chars / len(latencies),
+    }
+
+
+# Benchmark cases by name
+CASES = {
+    "csv_serial": bench_csv_serial,
+    "csv_parallel": bench_csv_parallel,
+    "csv_split_quotes": bench_csv_split_quotes,
+    "csv_french": bench_csv_french,
+    "infer_types": bench_infer_types,
+    "excel_streaming": bench_excel_streaming,
+    "excel_pandas": bench_excel_pandas,
+    "history_load": bench_history_load,
+    "result_compaction": bench_result_compaction,
+    "question_flow": bench_question_flow,
+}
+
+
+def peak_rss_mib():
+    """Peak resident memory of this process and its finished children, in MiB."""
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_case_in_child(name, scale, queue):
+    """Run one case in a fresh process and send back its metrics or its error."""
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            metrics = CASES[name](workdir, scale)
+        metrics["peak_rss_mib"] = peak_rss_mib()
+        queue.put((name, metrics, None))
+    except Exception as e:
+        queue.put((name, None, f"{type(e).__name__}: {e}"))
+
+
+def run_case(name, scale):
+    """Run a case in its own process, so that its peak RSS is not mixed with other cases."""
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=run_case_in_child, args=(name, scale, queue))
+    process.start()
+    _, metrics, error = queue.get()
+    process.join()
+    return metrics, error
+
+
+def compare(metrics, baseline, tolerance):
+    """Return the metrics that regressed by more than `tolerance` compared with the baseline."""
+    regressions = []
+    for metric, value in metrics.items():
+        reference = baseline.get(metric)
+        if value is None or not reference:
+            continue
+        change = (value - reference) / reference
+        if metric in HIGHER_IS_BETTER:
+            change = -change
+        if change > tolerance:
+            regressions.append(f"{metric} {reference:.4g} -> {value:.4g} ({change:+.0%})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks of BABot_SQL's hot paths.")
+    parser.add_argument("cases", nargs="*", help=f"Cases to run (default: all): {', '.join(CASES)}.")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier of the generated input sizes.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Relative change reported as a regression.")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline file.")
+    parser.add_argument("--save-baseline", action="store_true", help="Save the results as the new baselines.")
+    args = parser.parse_args(argv)
+    unknown_cases = set(args.cases) - set(CASES)
+    if unknown_cases:
+        parser.error(f"unknown cases: {', '.join(sorted(unknown_cases))}")
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as file:
+            baselines = json.load(file)
+    # Baselines only compare with runs of the same scale
+    scale_key = f"scale={args.scale:g}"
+    scale_baselines = baselines.get(scale_key, {})
+
+    results = {}
+    regressed = False
+    failed = False
+    for name in args.cases or CASES:
+        metrics, error = run_case(name, args.scale)
+        if error:
+            print(f"{name:16} ERROR {error}")
+            failed = True
+            continue
+        results[name] = metrics
+        print(f"{name:16} " + "  ".join(f"{metric}={value:.4g}" for metric, value in metrics.items() if value is not None))
+        regressions = compare(metrics, scale_baselines.get(name, {}), args.tolerance)
+        for regression in regressions:
+            print(f"{'':16} REGRESSION {regression}")
+        regressed = regressed or bool(regressions)
+
+    if args.save_baseline:
+        scale_baselines.update(results)
+        baselines[scale_key] = scale_baselines
+        baselines["machine"] = f"{platform.node()} {platform.machine()} {os.cpu_count()} CPUs, Python {platform.python_version()}"
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(baselines, file, indent=2, sort_keys=True)
+        print(f"Baselines saved to {args.baseline}")
+    return 1 if failed or (regressed and not args.save_baseline) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+import re
+import time
+
+
+class StubMessage:
+    """Minimal stand-in for a LangChain chat message or message chunk."""
+
+    def __init__(self, content):
+        self.content = content
+
+
+class StubLLM:
+    """
+    Deterministic local stand-in for ChatOpenAI, so the question flow can be timed offline.
+
+    SQL prompts are answered from `sql_answers`, keyed by question, or with a row count of the
+    first table of the schema. Answer prompts get a fixed French sentence quoting the prompt size,
+    streamed word by word. Optional delays simulate the latency of the API.
+    """
+
+    def __init__(self, sql_answers=None, call_latency=0.0, token_latency=0.0, max_tokens=4000):
+        self.sql_answers = sql_answers or {}
+        self.call_latency = call_latency
+        self.token_latency = token_latency
+        self.max_tokens = max_tokens
+        self.calls = 0
+        self.prompt_chars = 0
+
+    def respond(self, prompt):
+        """Deterministic text answering a prompt."""
+        self.calls += 1
+        self.prompt_chars += len(prompt)
+        question = re.search(r"question: '(.*?)' and the", prompt, flags=re.DOTALL)
+        question = question.group(1) if question else ""
+        if "database schema details" in prompt:
+            if question in self.sql_answers:
+                return self.sql_answers[question]
+            table = re.search(r'CREATE TABLE "?(\w+)"?', prompt)
+            return f'SELECT COUNT(*) FROM "{table.group(1)}"' if table else "SELECT 1"
+        return f"Voici la réponse à la question « {question} », calculée sur {len(prompt)} caractères de résultat."
+
+    def invoke(self, prompt):
+        text = self.respond(prompt)
+        time.sleep(self.call_latency + self.token_latency * len(text.split()))
+        return StubMessage(text)
+
+    def stream(self, prompt):
+        text = self.respond(prompt)
+        time.sleep(self.call_latency)
+        for word in text.split(" "):
+            time.sleep(self.token_latency)
+            yield StubMessage(word + " ")
@@ -0,0 +1,272 @@
+import json
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+# Metadata table holding the column profiles, stored in the same SQLite file as the data
+PROFILE_TABLE = "_column_profiles"
+
+# Number of smallest hash values kept per column to estimate its distinct count (KMV sketch)
+DISTINCT_SKETCH_SIZE = 1024
+
+# Number of value counters kept per column; top values are exact below this many distinct values
+TOP_VALUES_CAPACITY = 1000
+
+# Number of most frequent values reported per column
+TOP_VALUES = 5
+
+# Rows read at a time when a column has to be profiled again from the loaded table
+RESCAN_BATCH_ROWS = 10000
+
+# Columns aggregated per statistics query, within SQLite's limit of 2000 result columns
+STATISTICS_COLUMNS_PER_QUERY = 500
+
+# Largest hash value plus one, to turn the k-th smallest hash into a density
+HASH_SPACE = float(2 ** 64)
+
+
+def new_profiles(num_columns):
+    """
+    Empty running profiles for `num_columns` columns: distinct-count sketch, value counters, the
+    column type the values were counted with, and whether that type changed since.
+    """
+    return [{"sketch": np.empty(0, dtype=np.uint64), "counts": Counter(), "type": None, "stale": False}
+            for _ in range(num_columns)]
+
+
+def stored_values(values, column_type):
+    """
+    Values as SQLite stores them in a column of `column_type`: INTEGER and REAL columns convert
+    numbers given as text (REAL columns to floats), and TEXT columns keep numbers as their text,
+    booleans as '1' and '0'.
+    """
+    if column_type in ("INTEGER", "REAL"):
+        try:
+            # The values already fit the column type, so a plain NumPy conversion is enough
+            return values.astype(np.int64 if column_type == "INTEGER" else float)
+        except (TypeError, ValueError, OverflowError):
+            numbers = pd.to_numeric(values, errors="coerce")
+            return numbers.astype(float) if column_type == "REAL" else numbers
+    if column_type == "TEXT":
+        return np.array([value if isinstance(value, str) else str(int(value) if isinstance(value, (bool, np.bool_))
+                                                                    else value) for value in values], dtype=object)
+    return values
+
+
+def update_profiles(profiles, rows, column_types=None, cast=None):
+    """
+    Add a chunk of rows to the running profiles, with one vectorized value count per column.
+
+    The values are counted as they are stored, so `cast` turns them into the values the table
+    will hold for the column type inferred so far. A column whose type changes after its first
+    values were counted is marked stale and profiled again from the table by `finish_profiles`.
+
+    Only the distinct values of the chunk are hashed into the KMV sketch, and only its most
+    frequent values are merged into the bounded value counters, so the cost per chunk does not
+    depend on the number of values already seen.
+
+    Args:
+        profiles (list): Running profiles from `new_profiles`, updated in place.
+        rows (list | np.ndarray | pd.DataFrame): Chunk of rows, with None for missing values.
+        column_types (list): Column types covering this chunk.
+        cast (callable): Function (values, column type) -> stored values, such as `stored_values`;
+            None for values read back from the table.
+    """
+    columns = rows.to_numpy(dtype=object) if isinstance(rows, pd.DataFrame) else np.asarray(rows, dtype=object)
+    if columns.size == 0:
+        return
+    column_types = column_types or [None] * len(profiles)
+    for position, (profile, column_type) in enumerate(zip(profiles, column_types)):
+        if profile["stale"]:
+            continue
+        values = columns[:, position]
+        values = values[pd.notna(values) if isinstance(rows, pd.DataFrame) else np.not_equal(values, None)]
+        if len(values) == 0:
+            continue
+        if profile["type"] is not None and profile["type"] != column_type:
+            profile["stale"] = True  # The values counted so far are not stored as they were counted
+            continue
+        profile["type"] = column_type
+        if cast is not None:
+            values = cast(values, column_type)
+        value_counts = pd.Series(values).value_counts(sort=False)
+
+        # KMV sketch: the k smallest distinct hashes of the values seen so far; the values are
+        # already distinct, so hash_array does not need to factorize them first
+        distinct = value_counts.index.to_numpy()
+        if distinct.dtype == object:
+            distinct = distinct.astype(str).astype(object)
+        hashes = pd.util.hash_array(distinct, categorize=False)
+        if len(profile["sketch"]) == DISTINCT_SKETCH_SIZE:
+            hashes = hashes[hashes < profile["sketch"][-1]]  # Only smaller hashes can enter a full sketch
+        profile["sketch"] = np.unique(np.concatenate([profile["sketch"], hashes]))[:DISTINCT_SKETCH_SIZE]
+
+        # Bounded counters: only the most frequent values of the chunk are merged, and the least
+        # frequent counters are dropped beyond TOP_VALUES_CAPACITY
+        if len(value_counts) > TOP_VALUES_CAPACITY:
+            value_counts = value_counts.nlargest(TOP_VALUES_CAPACITY)
+        counts = profile["counts"]
+        counts.update(dict(zip(value_counts.index.tolist(), value_counts.tolist())))
+        if len(counts) > 2 * TOP_VALUES_CAPACITY:
+            profile["counts"] = Counter(dict(counts.most_common(TOP_VALUES_CAPACITY)))
+
+
+def reprofile_stale_columns(cursor, table_name, headers, profiles, batch_size=RESCAN_BATCH_ROWS):
+    """Profile again, from the values stored in the table, the columns marked stale."""
+    stale = [position for position, profile in enumerate(profiles) if profile["stale"]]
+    if not stale:
+        return
+    fresh = new_profiles(len(stale))
+    cursor.execute(f"SELECT {', '.join(headers[position] for position in stale)} FROM main.{table_name}")
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        update_profiles(fresh, rows)
+    for position, profile in zip(stale, fresh):
+        profiles[position] = profile
+
+
+def distinct_estimate(sketch, k=DISTINCT_SKETCH_SIZE):
+    """Number of distinct values estimated from a KMV sketch; exact when fewer than `k` were seen."""
+    if len(sketch) < k:
+        return len(sketch)
+    return int(round((k - 1) / ((float(sketch[k - 1]) + 1) / HASH_SPACE)))
+
+
+def column_statistics(cursor, table_name, headers):
+    """
+    Row count, and null count, minimum and maximum of every column of a loaded table.
+
+    The statistics are aggregated by SQLite over the typed values, a few hundred columns per pass.
+
+    Returns:
+        tuple: The row count, and a list of (null count, minimum, maximum) per column.
+    """
+    row_count = cursor.execute(f"SELECT COUNT(*) FROM main.{table_name}").fetchone()[0]
+    statistics = []
+    for start in range(0, len(headers), STATISTICS_COLUMNS_PER_QUERY):
+        columns = headers[start:start + STATISTICS_COLUMNS_PER_QUERY]
+        aggregates = ", ".join(f"COUNT({column}), MIN({column}), MAX({column})" for column in columns)
+        values = cursor.execute(f"SELECT {aggregates} FROM main.{table_name}").fetchone()
+        statistics += [(row_count - values[i], values[i + 1], values[i + 2]) for i in range(0, len(values), 3)]
+    return row_count, statistics
+
+
+def finish_profiles(cursor, table_name, headers, profiles, column_types):
+    """
+    Complete the running profiles of a loaded table into the rows of the metadata table.
+
+    Returns:
+        list: One dict per column with its name, type, row, null and estimated distinct counts,
+            minimum, maximum and most frequent values.
+    """
+    reprofile_stale_columns(cursor, table_name, headers, profiles)
+    row_count, statistics = column_statistics(cursor, table_name, headers)
+    finished = []
+    for position, (header, profile, column_type, (null_count, minimum, maximum)) in enumerate(
+            zip(headers, profiles, column_types, statistics)):
+        finished.append({
+            "column_name": header,
+            "position": position,
+            "data_type": column_type,
+            "row_count": row_count,
+            "null_count": null_count,
+            "distinct_estimate": distinct_estimate(profile["sketch"]),
+            "min_value": minimum,
+            "max_value": maximum,
+            "top_values": json.dumps(profile["counts"].most_common(TOP_VALUES), ensure_ascii=False),
+        })
+    return finished
+
+
+def store_profiles(cursor, table_name, column_profiles, schema="main"):
+    """Replace the stored profiles of a table with `column_profiles` (from `finish_profiles`)."""
+    cursor.execute(f"""CREATE TABLE IF NOT EXISTS {schema}.{PROFILE_TABLE} (
+        table_name TEXT NOT NULL,
+        column_name TEXT NOT NULL,
+        position INTEGER,
+        data_type TEXT,
+        row_count INTEGER,
+        null_count INTEGER,
+        distinct_estimate INTEGER,
+        min_value,
+        max_value,
+        top_values TEXT,
+        PRIMARY KEY (table_name, column_name)
+    )""")
+    cursor.execute(f"DELETE FROM {schema}.{PROFILE_TABLE} WHERE table_name = ?", (table_name,))
+    cursor.executemany(
+        f"INSERT INTO {schema}.{PROFILE_TABLE} (table_name, column_name, position, data_type, row_count, null_count, "
+        f"distinct_estimate, min_value, max_value, top_values) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [(table_name, profile["column_name"], profile["position"], profile["data_type"], profile["row_count"],
+          profile["null_count"], profile["distinct_estimate"], profile["min_value"], profile["max_value"],
+          profile["top_values"]) for profile in column_profiles]
+    )
+
+
+def copy_profiles(cursor, source_schema, table_name):
+    """Copy the profiles of a table from an attached database into the main one, if it has any."""
+    has_profiles = cursor.execute(
+        f"SELECT 1 FROM {source_schema}.sqlite_master WHERE type = 'table' AND name = ?", (PROFILE_TABLE,)
+    ).fetchone()
+    if has_profiles:
+        rows = cursor.execute(
+            f"SELECT column_name, position, data_type, row_count, null_count, distinct_estimate, min_value, "
+            f"max_value, top_values FROM {source_schema}.{PROFILE_TABLE} WHERE table_name = ?", (table_name,)
+        ).fetchall()
+        keys = ["column_name", "position", "data_type", "row_count", "null_count", "distinct_estimate", "min_value",
+                "max_value", "top_values"]
+        store_profiles(cursor, table_name, [dict(zip(keys, row)) for row in rows])
+
+
+def read_profiles(engine, table):
+    """
+    Stored profiles of a table as a DataFrame, in column order.
+
+    Returns an empty DataFrame for databases that were not converted by this application.
+    """
+    with engine.connect() as conn:
+        has_profiles = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (PROFILE_TABLE,)
+        ).fetchone() if engine.dialect.name == "sqlite" else None
+        if not has_profiles:
+            return pd.DataFrame()
+        return pd.read_sql_query(
+            f"SELECT column_name, data_type, row_count, null_count, distinct_estimate, min_value, max_value, "
+            f"top_values FROM {PROFILE_TABLE} WHERE table_name = ? ORDER BY position", conn, params=(table,)
+        )
+
+
+def profile_comment(table, profiles):
+    """
+    Describe the profiles of a table for the LLM, in place of the sample rows of table_info.
+
+    Args:
+        table (str): Table name.
+        profiles (pd.DataFrame): Profiles from `read_profiles`.
+
+    Returns:
+        str: An SQL comment with one line per column.
+    """
+    lines = [f"/*\nColumn profiles of the {table} table:"]
+    for profile in profiles.itertuples(index=False):
+        line = (f"{profile.column_name}: {profile.null_count} nulls out of {profile.row_count} rows, "
+                f"~{profile.distinct_estimate} distinct values")
+        if profile.data_type == "BOOLEAN":
+            line += ", booleans stored as 1 (true) and 0 (false)"
+        if pd.notna(profile.min_value):
+            line += f", min {sql_literal(profile.min_value)}, max {sql_literal(profile.max_value)}"
+        top_values = json.loads(profile.top_values or "[]")
+        if top_values:
+            line += ", most frequent: " + ", ".join(f"{sql_literal(value)} ({count})" for value, count in top_values)
+        lines.append(line)
+    return "\n".join(lines) + "\n*/"
+
+
+def sql_literal(value):
+    """Render a stored value as it is written in SQL, so that text and numbers are told apart."""
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return str(value)
@@ -0,0 +1,199 @@
+import hashlib
+import json
+import os
+import shutil
+
+# Directory holding converted databases, named after their cache key
+CACHE_DIR = "data/cache"
+
+# Total size of cached databases above which the least recently used ones are evicted
+MAX_CACHE_BYTES = 2 * 1024 ** 3
+
+# Suffix of the file next to each cached database whose modification time records its last use
+LAST_USED_SUFFIX = ".last_used"
+
+# Bump when a converter change makes previously cached databases stale
+CONVERTER_VERSION = 2
+
+
+def content_hash(data):
+    """Return the SHA-256 hex digest of a bytes-like object."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(path, block_size=1024 * 1024):
+    """Return the SHA-256 hex digest of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(digest, settings):
+    """
+    Build the cache key of a conversion.
+
+    Args:
+        digest (str): Content hash of the uploaded file.
+        settings (dict): Converter settings that change the output (converter, file name, options...).
+
+    Returns:
+        str: Hex digest identifying the converted database.
+    """
+    payload = json.dumps({"digest": digest, "settings": settings, "version": CONVERTER_VERSION}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def cache_path(key):
+    """Path of the cached database for a key."""
+    return os.path.join(CACHE_DIR, f"{key}.sqlite")
+
+
+def partial_path(key, directory=CACHE_DIR):
+    """
+    Path a conversion writes to before it is published in the cache.
+
+    Sessions converting the same file at once pass their own directory, so they never write to
+    the same partial file.
+    """
+    return os.path.join(directory, f"{key}.sqlite.partial")
+
+
+def cache_lookup(key):
+    """
+    Return the cached database for a key, or None on a miss.
+
+    A hit refreshes the modification time of the entry's marker file, which is what LRU eviction
+    orders on. The database file itself is left untouched, so sessions reading it see no change.
+    """
+    path = cache_path(key)
+    if not os.path.isfile(path):
+        return None
+    mark_used(path)
+    return path
+
+
+def mark_used(path):
+    """Record the use of a cached database on its marker file."""
+    with open(f"{path}{LAST_USED_SUFFIX}", "a"):
+        pass
+    os.utime(f"{path}{LAST_USED_SUFFIX}")
+
+
+def last_used(path):
+    """Time of the last use of a cached database, or its modification time if it has no marker."""
+    marker = f"{path}{LAST_USED_SUFFIX}"
+    return os.path.getmtime(marker if os.path.exists(marker) else path)
+
+
+def cache_store(key, converted_path, max_bytes=MAX_CACHE_BYTES):
+    """
+    Publish a converted database in the cache and evict old entries.
+
+    Args:
+        key (str): Cache key of the conversion.
+        converted_path (str): Database produced by the converter, moved into the cache.
+        max_bytes (int): Size budget of the cache directory.
+
+    Returns:
+        str: Path of the cached database.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = cache_path(key)
+    os.replace(converted_path, path)  # Atomic, so readers never see a half-written database
+    mark_used(path)
+    evict_lru(max_bytes, keep=path)
+    return path
+
+
+def pin_entry(path, pinned_path):
+    """
+    Give a session its own link to a cached database, so that evicting the cache entry never
+    removes a database the session is querying; the link counts in the session's workspace quota.
+
+    Args:
+        path (str): Cached database.
+        pinned_path (str): Path of the link, inside the session's workspace.
+
+    Returns:
+        str: `pinned_path`.
+    """
+    if os.path.exists(pinned_path) and os.path.samefile(path, pinned_path):
+        return pinned_path
+    temp_path = f"{pinned_path}.pinning"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    try:
+        os.link(path, temp_path)
+    except OSError:
+        shutil.copyfile(path, temp_path)  # No hard links across filesystems
+    os.replace(temp_path, pinned_path)  # Connections still open on a previous database keep reading it
+    return pinned_path
+
+
+def unpin_entry(pinned_path):
+    """
+    Replace a session's link to a cached database by a private copy before the session writes
+    to it, so that the cache entry and the links of other sessions keep the converted database.
+
+    Args:
+        pinned_path (str): Link returned by `pin_entry`.
+
+    Returns:
+        str: `pinned_path`, now the only link to its file.
+    """
+    if os.stat(pinned_path).st_nlink == 1:
+        return pinned_path
+    temp_path = f"{pinned_path}.unpinning"
+    shutil.copyfile(pinned_path, temp_path)
+    os.replace(temp_path, pinned_path)  # Connections still open on the shared file keep reading it
+    return pinned_path
+
+
+def evict_lru(max_bytes=MAX_CACHE_BYTES, keep=None):
+    """
+    Delete the least recently used databases until the cache fits in `max_bytes`.
+
+    Args:
+        max_bytes (int): Size budget of the cache directory.
+        keep (str): Path that must not be evicted (the entry just stored).
+    """
+    if not os.path.isdir(CACHE_DIR):
+        return
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        if not name.endswith(".sqlite"):
+            continue
+        path = os.path.join(CACHE_DIR, name)
+        entries.append((last_used(path), os.path.getsize(path), path))
+
+    total_bytes = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total_bytes <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+            if os.path.exists(f"{path}{LAST_USED_SUFFIX}"):
+                os.remove(f"{path}{LAST_USED_SUFFIX}")
+            total_bytes -= size
+            print(f"Evicted cached database {path}")
+        except OSError as e:
+            print(f"Error evicting cached database {path}: {e}")
+
+
+def write_if_changed(path, data, digest=None):
+    """
+    Write `data` to `path` unless the file already holds exactly these bytes.
+
+    Returns:
+        bool: True if the file was written.
+    """
+    if os.path.isfile(path) and os.path.getsize(path) == len(data):
+        if file_hash(path) == (digest or content_hash(data)):
+            return False
+    with open(path, "wb") as file:
+        file.write(data)
+    return True
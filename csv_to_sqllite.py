@@ -1,9 +1,75 @@
 import csv
+import io
+import mmap
 import sqlite3
 import os
 import re  # To sanitize table names
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
-def csv_to_sqlite(csv_file, db_file, encoding='utf-8', delimiter=None):
+import numpy as np
+import pandas as pd
+
+from column_profiles import finish_profiles, new_profiles, store_profiles, stored_values, update_profiles
+
+# Number of rows handed to executemany at once; bounds memory whatever the file size
+DEFAULT_BATCH_SIZE = 10000
+
+# Files smaller than this are always parsed serially; process start-up would dominate
+PARALLEL_MIN_BYTES = 32 * 1024 * 1024
+
+# Size of the byte ranges handed to parser processes
+DEFAULT_RANGE_BYTES = 4 * 1024 * 1024
+
+# Values typing a column: ISO 8601 dates are YYYY-MM-DD, followed in datetimes by 'T' or a space
+DATE_LENGTH = 10
+DATETIME_SEPARATORS = ('T', ' ')
+TRUE_VALUES = ('true', 'vrai', 'oui', 'yes')
+FALSE_VALUES = ('false', 'faux', 'non', 'no')
+
+# Pairs of column types that widen to something narrower than TEXT
+TYPE_WIDENING = {
+    frozenset(("INTEGER", "REAL")): "REAL",
+    frozenset(("DATE", "DATETIME")): "DATETIME",
+}
+
+# PRAGMAs applied while bulk loading (page_size only takes effect on a new database)
+BULK_PRAGMAS = [
+    ("page_size", 8192),
+    ("journal_mode", "MEMORY"),
+    ("synchronous", "OFF"),
+    ("cache_size", -65536),  # Negative value = size in KiB (64 MiB)
+    ("temp_store", "MEMORY"),
+]
+
+# Durable settings restored once the load is committed
+SAFE_PRAGMAS = [
+    ("journal_mode", "DELETE"),
+    ("synchronous", "FULL"),
+    ("cache_size", -2000),
+    ("temp_store", "DEFAULT"),
+]
+
+
+def csv_to_sqlite(csv_file, db_file, encoding='utf-8', delimiter=None, batch_size=DEFAULT_BATCH_SIZE, bulk=True,
+                  index_columns=None, workers=None, profile=True):
+    """
+    Import a CSV file into an SQLite table named after the file.
+
+    Args:
+        csv_file (str): Path to the CSV file.
+        db_file (str): Path to the SQLite database file.
+        encoding (str): Encoding of the CSV file.
+        delimiter (str): Field delimiter, sniffed from the file when None.
+        batch_size (int): Number of rows inserted per executemany call.
+        bulk (bool): Apply ingest-time PRAGMAs during the load and restore safe ones afterwards.
+        index_columns (list): Columns (or tuples of columns) to index once the data is loaded.
+        workers (int): Number of parser processes. Files larger than PARALLEL_MIN_BYTES are split into
+            byte ranges parsed in parallel, while this process remains the single SQLite writer.
+        profile (bool): Profile every column while its rows are loaded and store the profiles in
+            the column_profiles.PROFILE_TABLE metadata table.
+    """
     # Check if the CSV file exists
     if not os.path.isfile(csv_file):
         print(f"Error: CSV file '{csv_file}' not found.")
@@ -23,6 +89,8 @@ def csv_to_sqlite(csv_file, db_file, encoding='utf-8', delimiter=None):
     # Connect to SQLite database (it will be created if it doesn't exist)
     conn = sqlite3.connect(db_file)
     cursor = conn.cursor()
+    if bulk:
+        apply_pragmas(cursor, BULK_PRAGMAS)
 
     # Read the CSV file
     try:
@@ -30,82 +98,339 @@ def csv_to_sqlite(csv_file, db_file, encoding='utf-8', delimiter=None):
             csv_reader = csv.reader(file, delimiter=delimiter)
             headers = next(csv_reader)  # Get column names from the first row
 
-            # Clean headers to make them SQL-compliant
-            headers = [header.strip().replace(" ", "_").replace("-", "_").replace(".", "_") for header in headers]
+            # Clean headers to make them SQL-compliant: every character other than a letter, digit or
+            # underscore (spaces, '-', '.', '/', parentheses of French exports...) becomes an underscore
+            headers = [re.sub(r'\W', '_', header.strip()) for header in headers]
 
             # Sanitize the table name to ensure it's valid in SQLite
             table_name = os.path.splitext(os.path.basename(csv_file))[0]
             table_name = re.sub(r'\W+', '_', table_name)  # Replace invalid characters with underscores
             print(f"Sanitized table name: {table_name}")
 
-            # Infer data types by analyzing sample rows
-            data_types = infer_column_types(csv_reader, len(headers))
-            print(f"Inferred data types: {data_types}")
+            # Rows are staged as raw text in a throwaway database while each chunk is typed,
+            # so the file is read once and the final column types cover every row
+            staging_file = f"{db_file}.staging"
+            if os.path.exists(staging_file):
+                os.remove(staging_file)
+            cursor.execute("ATTACH DATABASE ? AS staging", (staging_file,))
+            apply_pragmas(cursor, [("staging.journal_mode", "OFF"), ("staging.synchronous", "OFF")])
+            cursor.execute(f"CREATE TABLE staging.{table_name} ({', '.join(headers)})")
+
+            if workers and workers > 1 and os.path.getsize(csv_file) >= PARALLEL_MIN_BYTES:
+                print(f"Parsing in parallel with {workers} processes")
+                batches = parallel_batches(csv_file, encoding, delimiter, len(headers), workers)
+            else:
+                batches = ((batch, None) for batch in read_batches(csv_reader, len(headers), batch_size))
 
-            # Create a table with appropriate columns and inferred types
-            create_table_sql = f"""CREATE TABLE IF NOT EXISTS {table_name} ({', '.join([f'{header} {data_type}' for header, data_type in zip(headers, data_types)])})"""
-            cursor.execute(create_table_sql)
+            # Insert data in fixed-size batches, respecting missing values, widening types as chunks arrive
+            insert_sql = f"INSERT INTO staging.{table_name} ({', '.join(headers)}) VALUES ({', '.join(['?' for _ in headers])})"
+            start_time = time.perf_counter()
+            row_count = 0
+            column_types = [None] * len(headers)
+            profiles = new_profiles(len(headers)) if profile else None
+            for batch, chunk_types in batches:
+                # One object array per chunk, shared by the type inference and the profiles
+                columns = np.array(batch, dtype=object)
+                if chunk_types is None:
+                    chunk_types = infer_chunk_types(columns, column_types)
+                column_types = [widen_type(current, new) for current, new in zip(column_types, chunk_types)]
+                if profiles is not None:
+                    update_profiles(profiles, columns, column_types, cast=stored_csv_values)
+                cursor.executemany(insert_sql, batch)
+                row_count += len(batch)
 
-            # Reset reader to start inserting rows
-            file.seek(0)
-            next(csv_reader)  # Skip headers again
+        # Columns that were empty throughout keep the historical INTEGER default
+        data_types = [column_type or "INTEGER" for column_type in column_types]
+        print(f"Inferred data types: {data_types}")
 
-            # Insert data row by row, respecting missing values
-            insert_sql = f"INSERT INTO {table_name} ({', '.join(headers)}) VALUES ({', '.join(['?' for _ in headers])})"
-            for row in csv_reader:
-                # Pad or truncate rows to match header count
-                row = row[:len(headers)] + [None] * (len(headers) - len(row))
-                # Replace empty strings with None for proper NULL handling
-                processed_row = [None if value.strip() == '' else value for value in row]
-                cursor.execute(insert_sql, processed_row)
+        # Create a table with appropriate columns and inferred types, then copy the staged rows
+        # so that SQLite's column affinity converts the values
+        create_table_sql = f"""CREATE TABLE IF NOT EXISTS {table_name} ({', '.join([f'{header} {data_type}' for header, data_type in zip(headers, data_types)])})"""
+        cursor.execute(create_table_sql)
+        select_columns = ', '.join(cast_expression(header, data_type) for header, data_type in zip(headers, data_types))
+        cursor.execute(f"INSERT INTO main.{table_name} ({', '.join(headers)}) "
+                       f"SELECT {select_columns} FROM staging.{table_name}")
+        if profiles is not None:
+            store_profiles(cursor, table_name, finish_profiles(cursor, table_name, headers, profiles, data_types))
 
-        # Commit changes and close connection
+        # Commit changes, then build indexes on the loaded table
         conn.commit()
-        print(f"CSV data has been successfully imported into {db_file}")
+        cursor.execute("DETACH DATABASE staging")
+        elapsed = time.perf_counter() - start_time
+        if index_columns:
+            create_indexes(cursor, table_name, index_columns)
+        # Collect statistics so the query planner can choose between indexes
+        cursor.execute("ANALYZE")
+        conn.commit()
+        if bulk:
+            apply_pragmas(cursor, SAFE_PRAGMAS)
+
+        rows_per_sec = row_count / elapsed if elapsed > 0 else float(row_count)
+        print(f"CSV data has been successfully imported into {db_file} "
+              f"({row_count} rows in {elapsed:.2f}s, {rows_per_sec:,.0f} rows/sec)")
 
     except Exception as e:
         print(f"Error during import: {e}")
 
     finally:
         conn.close()
+        if os.path.exists(f"{db_file}.staging"):
+            os.remove(f"{db_file}.staging")  # Staged rows are only needed during the load
 
 
-def infer_column_types(csv_reader, num_columns, sample_size=100):
+def read_batches(csv_reader, num_columns, batch_size=DEFAULT_BATCH_SIZE):
     """
-    Infer data types for each column based on a sample of the data.
+    Yield lists of at most `batch_size` rows ready for insertion.
 
     Args:
-        csv_reader (iterator): CSV reader object.
-        num_columns (int): Number of columns in the CSV.
-        sample_size (int): Number of rows to sample.
+        csv_reader (iterator): CSV reader positioned on the first data row.
+        num_columns (int): Number of columns in the target table.
+        batch_size (int): Maximum number of rows per batch.
+
+    Yields:
+        list: Rows padded or truncated to `num_columns`, with empty values as None.
+    """
+    batch = []
+    for row in csv_reader:
+        batch.append(process_row(row, num_columns))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def process_row(row, num_columns):
+    """Pad/truncate a parsed row and turn empty values into None."""
+    # Pad or truncate rows to match header count
+    if len(row) != num_columns:
+        row = row[:num_columns] + [None] * (num_columns - len(row))
+    # Replace empty and blank strings with None for proper NULL handling
+    return [value if value and not value.isspace() else None for value in row]
+
+
+def infer_chunk_types(rows, known_types=None):
+    """
+    Infer the type of each column over a chunk of rows with vectorized pandas parsing.
+
+    Args:
+        rows (list | np.ndarray): Processed rows of equal length, with empty values as None.
+        known_types (list): Types inferred so far; columns already TEXT are not parsed again, and
+            the other columns are only tested against the type they already have.
 
     Returns:
-        list: A list of inferred data types for each column.
+        list: One of INTEGER, REAL, BOOLEAN, DATE, DATETIME or TEXT per column,
+            or None for columns that are empty in this chunk.
     """
-    column_types = ["INTEGER"] * num_columns  # Start assuming all columns are INTEGER
+    if len(rows) == 0:
+        return []
+    columns = np.asarray(rows, dtype=object)
+    known_types = known_types or [None] * columns.shape[1]
+    chunk_types = []
+    for position, known_type in enumerate(known_types):
+        if known_type == "TEXT":
+            chunk_types.append("TEXT")
+            continue
+        values = columns[:, position]
+        chunk_types.append(infer_series_type(values[np.not_equal(values, None)], known_type))
+    return chunk_types
 
-    for _ in range(sample_size):
-        try:
-            row = next(csv_reader)
-        except StopIteration:
-            break  # End of file
-
-        for i, value in enumerate(row):
-            if value.strip() == '':
-                continue  # Skip empty values
-            if column_types[i] == "TEXT":
-                continue  # Once TEXT, it stays TEXT
-            try:
-                int(value)
-                continue  # Still INTEGER
-            except ValueError:
-                try:
-                    float(value)
-                    column_types[i] = "REAL"  # Upgrade to REAL
-                except ValueError:
-                    column_types[i] = "TEXT"  # Upgrade to TEXT
-
-    return column_types
+
+def infer_series_type(values, known_type=None):
+    """
+    Return the narrowest column type matching every value of an array of non-null strings.
+
+    Every test is a single vectorized parse. A column cannot narrow, so when the type of the
+    previous chunks is known, only whether the chunk still fits that type (or one it widens to)
+    is tested, and any other chunk is TEXT.
+    """
+    if len(values) == 0:
+        return None
+    if known_type in (None, "INTEGER", "REAL"):
+        numbers = pd.to_numeric(values, errors='coerce')
+        # NaN marks the values that are not numbers; to_numeric also accepts 'inf', which SQLite
+        # would keep as text
+        if np.isfinite(numbers.astype(float)).all():
+            return "INTEGER" if pd.api.types.is_integer_dtype(numbers) else "REAL"
+        if known_type is not None:
+            return "TEXT"
+    if known_type in (None, "BOOLEAN"):
+        # Fixed-width NumPy strings, so that stripping and lower-casing run as C loops
+        if np.isin(np.char.lower(np.char.strip(values.astype(str))), TRUE_VALUES + FALSE_VALUES).all():
+            return "BOOLEAN"
+        if known_type is not None:
+            return "TEXT"
+    return iso_date_type(values)
+
+
+def iso_date_type(values):
+    """
+    DATE when every value is an ISO 8601 date (YYYY-MM-DD), DATETIME when every value is such a
+    date optionally followed by 'T' or a space and a time, TEXT otherwise.
+    """
+    # Values are only stripped when some of them do not parse as they are
+    if pd.to_datetime(values, format='ISO8601', errors='coerce', utc=True).isna().any():
+        values = np.char.strip(values.astype(str))
+        if pd.to_datetime(values, format='ISO8601', errors='coerce', utc=True).isna().any():
+            return "TEXT"
+    chars = values.astype(str)
+    # The ISO 8601 parser also accepts '2020-01' or '2020-1-5', hence the check of the date part
+    lengths = np.char.str_len(chars)
+    if (lengths < DATE_LENGTH).any():
+        return "TEXT"
+    if (lengths == DATE_LENGTH).all():
+        return "DATE"
+    # Character following the date part of each value; the array pads shorter values with 0
+    following = chars.view(np.uint32).reshape(len(chars), -1)[:, DATE_LENGTH]
+    separators = [0] + [ord(separator) for separator in DATETIME_SEPARATORS]
+    return "DATETIME" if np.isin(following, separators).all() else "TEXT"
+
+
+def widen_type(current, new):
+    """
+    Combine the type seen so far for a column with the type of a new chunk.
+
+    INTEGER and REAL widen to REAL, DATE and DATETIME to DATETIME, and any other
+    mismatch to TEXT. None stands for a column that has only held empty values.
+    """
+    if current is None:
+        return new
+    if new is None or new == current:
+        return current
+    return TYPE_WIDENING.get(frozenset((current, new)), "TEXT")
+
+
+def cast_expression(column, data_type):
+    """SQL expression copying a staged text column into its typed column."""
+    if data_type == "BOOLEAN":
+        true_values = ', '.join(f"'{value}'" for value in TRUE_VALUES)
+        false_values = ', '.join(f"'{value}'" for value in FALSE_VALUES)
+        return (f"CASE WHEN lower(trim({column})) IN ({true_values}) THEN 1 "
+                f"WHEN lower(trim({column})) IN ({false_values}) THEN 0 ELSE {column} END")
+    return column
+
+
+def stored_csv_values(values, data_type):
+    """Python counterpart of `cast_expression`: the values a staged text column holds once copied."""
+    if data_type == "BOOLEAN":
+        lowered = np.char.lower(np.char.strip(values.astype(str)))
+        return np.where(np.isin(lowered, TRUE_VALUES), 1, 0)
+    if data_type in ("INTEGER", "REAL"):
+        return stored_values(values, data_type)
+    return values  # Dates stay as their text
+
+
+def split_csv_ranges(csv_file, range_bytes=DEFAULT_RANGE_BYTES, delimiter=',', quotechar='"'):
+    """
+    Split a CSV file into byte ranges that start and end on record boundaries.
+
+    A newline only ends a record when it sits outside a quoted field. Quoting is tracked the
+    way the csv module reads it: a quote character opens a quoted field only at the start of a
+    field, and the field runs to the next quote that is not doubled; a quote anywhere else is
+    a literal character. The header record is excluded from the returned ranges.
+
+    Args:
+        csv_file (str): Path to the CSV file.
+        range_bytes (int): Approximate size of each range.
+        delimiter (str): Field delimiter of the CSV dialect.
+        quotechar (str): Quote character of the CSV dialect.
+
+    Returns:
+        list: (start, end) byte offsets of each range of data records.
+    """
+    quote = re.escape(quotechar.encode())
+    # Quoted fields: a quote that starts the file or follows a delimiter or a newline, up to the
+    # next quote that is not doubled. The pattern starts with the quote itself, checking what
+    # precedes it afterwards, so that the regex engine only stops on quote characters
+    quoted_field = re.compile(
+        quote + rb'(?<![^' + re.escape(delimiter.encode()) + rb'\r\n]' + quote + rb')'
+        + rb'[^' + quote + rb']*(?:' + quote + quote + rb'[^' + quote + rb']*)*' + quote
+    )
+    cuts = []
+    with open(csv_file, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            fields = quoted_field.finditer(data)
+            field = next(fields, None)
+            position = 0  # The first cut is the end of the header record
+            while True:
+                newline = data.find(b'\n', position)
+                if newline == -1:
+                    break
+                while field is not None and field.end() <= newline:
+                    field = next(fields, None)
+                if field is not None and field.start() < newline:
+                    position = field.end()  # The newline belongs to a quoted field
+                    continue
+                cuts.append(newline + 1)
+                position = newline + 1 + range_bytes
+            file_size = len(data)
+            fields = field = None  # Matches hold the mapped buffer, which cannot be closed while they exist
+
+    if not cuts:
+        return []
+    if cuts[-1] < file_size:
+        cuts.append(file_size)
+    return list(zip(cuts[:-1], cuts[1:]))
+
+
+def parse_csv_range(csv_file, start, end, encoding, delimiter, num_columns):
+    """
+    Parse and type the records of one byte range (runs in a worker process).
+
+    Returns:
+        tuple: Processed rows, identical to what `read_batches` produces for the same records,
+            and the column types inferred from them.
+    """
+    with open(csv_file, 'rb') as file:
+        file.seek(start)
+        text = file.read(end - start).decode(encoding, errors='ignore')
+    # newline=None applies the same universal-newline translation as the serial text-mode reader
+    csv_reader = csv.reader(io.StringIO(text, newline=None), delimiter=delimiter)
+    rows = [process_row(row, num_columns) for row in csv_reader]
+    return rows, infer_chunk_types(rows)
+
+
+def parallel_batches(csv_file, encoding, delimiter, num_columns, workers, range_bytes=DEFAULT_RANGE_BYTES):
+    """
+    Parse a CSV file in a process pool and yield (rows, column types) for each range in file order.
+
+    At most two ranges per worker are in flight, so memory stays bounded when the
+    SQLite writer is slower than the parsers.
+    """
+    ranges = split_csv_ranges(csv_file, range_bytes, delimiter)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for start, end in ranges:
+            pending.append(executor.submit(parse_csv_range, csv_file, start, end, encoding, delimiter, num_columns))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def apply_pragmas(cursor, pragmas):
+    """Apply a list of (name, value) PRAGMA settings on a connection."""
+    for name, value in pragmas:
+        cursor.execute(f"PRAGMA {name} = {value}")
+
+
+def create_indexes(cursor, table_name, index_columns):
+    """
+    Create indexes on a loaded table.
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor on the target database.
+        table_name (str): Table to index.
+        index_columns (list): Column names, or tuples of column names for multi-column indexes.
+    """
+    for columns in index_columns:
+        if isinstance(columns, str):
+            columns = (columns,)
+        index_name = re.sub(r'\W+', '_', f"idx_{table_name}_{'_'.join(columns)}")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} ({', '.join(columns)})")
+        print(f"Created index {index_name}")
 
 
 # Example usage
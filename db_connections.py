@@ -0,0 +1,254 @@
+import os
+import sqlite3
+import weakref
+from pathlib import Path
+
+import pandas as pd
+from sqlalchemy import URL, create_engine, event, inspect, make_url
+from sqlalchemy.pool import QueuePool, StaticPool
+
+from column_profiles import PROFILE_TABLE, read_profiles
+from csv_to_sqllite import apply_pragmas
+from sql_guard import QUERY_TIMEOUT_SECONDS
+
+# Uploaded SQLite databases up to this size are loaded into memory instead of written to disk
+MEMORY_DB_MAX_BYTES = 256 * 1024 * 1024
+
+# Settings of the read-only session connections: memory-mapped reads and a larger page cache
+READ_ONLY_PRAGMAS = [
+    ("mmap_size", 256 * 1024 * 1024),
+    ("cache_size", -65536),  # Negative value = size in KiB (64 MiB)
+    ("temp_store", "MEMORY"),
+]
+
+# File change counter of the SQLite header, incremented by every write transaction
+CHANGE_COUNTER_OFFSET = 24
+CHANGE_COUNTER_BYTES = 4
+
+# Number of rows of the table preview
+PREVIEW_ROWS = 5
+
+# Connections kept open by the shared server engine, and extra ones allowed under load
+SERVER_POOL_SIZE = 5
+SERVER_MAX_OVERFLOW = 5
+
+# Server connections older than this are replaced, before the server or a proxy drops them
+SERVER_POOL_RECYCLE_SECONDS = 1800
+
+
+def deserialize_sqlite(data):
+    """
+    Load the bytes of an SQLite database file into an in-memory connection.
+
+    Args:
+        data (bytes): Content of an SQLite database file.
+
+    Returns:
+        sqlite3.Connection: In-memory connection holding the database.
+    """
+    # Streamlit reruns can happen on another thread than the one that created the connection
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    conn.deserialize(data)
+    return conn
+
+
+def memory_engine(conn):
+    """
+    Wrap a single SQLite connection in a SQLAlchemy engine.
+
+    The engine always hands out that same connection, so the table preview, LangChain's
+    SQLDatabase and query execution all share it, including a database held in RAM.
+    """
+    return create_engine("sqlite://", creator=lambda: conn, poolclass=StaticPool)
+
+
+def file_engine(db_path):
+    """SQLAlchemy engine on an SQLite database file."""
+    return create_engine(f"sqlite:///{db_path}")
+
+
+def read_only_engine(db_path, pool_size=5):
+    """
+    Pooled read-only engine on an SQLite database file, for queries run from several threads.
+
+    Each pooled connection is opened through a `mode=ro` URI and tuned with READ_ONLY_PRAGMAS.
+    """
+    uri = f"{Path(db_path).resolve().as_uri()}?mode=ro"
+    engine = create_engine(
+        "sqlite://",
+        creator=lambda: sqlite3.connect(uri, uri=True, check_same_thread=False),
+        poolclass=QueuePool,
+        pool_size=pool_size,
+        max_overflow=0,
+    )
+
+    @event.listens_for(engine, "connect")
+    def tune_connection(dbapi_connection, connection_record):
+        apply_pragmas(dbapi_connection.cursor(), READ_ONLY_PRAGMAS)
+
+    return engine
+
+
+def file_fingerprint(db_path):
+    """
+    Fingerprint of a database file that changes whenever the file is replaced or modified.
+
+    It combines the inode and size of the file with the change counter of its SQLite header,
+    so a file whose modification time alone changed keeps its fingerprint.
+    """
+    stat = os.stat(db_path)
+    with open(db_path, "rb") as file:
+        file.seek(CHANGE_COUNTER_OFFSET)
+        change_counter = int.from_bytes(file.read(CHANGE_COUNTER_BYTES), "big")
+    return f"{db_path}:{stat.st_ino}:{stat.st_size}:{change_counter}"
+
+
+def table_names(engine):
+    """Return the names of the data tables of the database behind an engine, without the profiles table."""
+    return [table for table in inspect(engine).get_table_names() if table != PROFILE_TABLE]
+
+
+def open_session_database(db_path):
+    """
+    Open a database file read-only for one Streamlit session.
+
+    The single connection is opened through a `mode=ro` URI, tuned with READ_ONLY_PRAGMAS and
+    reused across reruns by the table list, the preview, LangChain's SQLDatabase and query
+    execution. It is closed by `close_session_database`, or when the session state holding
+    the engine is discarded at the end of the session.
+
+    Args:
+        db_path (str): Path of the SQLite database file.
+
+    Returns:
+        dict: The session database: path, fingerprint, connection, engine and cached reads.
+    """
+    fingerprint = file_fingerprint(db_path)
+    conn = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False)
+    apply_pragmas(conn.cursor(), READ_ONLY_PRAGMAS)
+    engine = memory_engine(conn)
+    weakref.finalize(engine, conn.close)
+    return {"path": db_path, "fingerprint": fingerprint, "conn": conn, "engine": engine, "tables": None, "previews": {},
+            "profiles": {}, "sql_database": None}
+
+
+def memory_session_database(data, digest):
+    """Session database over an uploaded database loaded into memory, identified by its digest."""
+    conn = deserialize_sqlite(data)
+    engine = memory_engine(conn)
+    weakref.finalize(engine, conn.close)
+    return {"path": ":memory:", "fingerprint": digest, "conn": conn, "engine": engine, "tables": None, "previews": {},
+            "profiles": {}, "sql_database": None}
+
+
+def close_session_database(session_db):
+    """Close the connection of a session database, unless it belongs to the shared server engine."""
+    if session_db["conn"] is None:
+        return
+    session_db["engine"].dispose()
+    session_db["conn"].close()
+
+
+def sync_session_database(session_db, db_path):
+    """
+    Return the session database of a file, reopening it only if the file was replaced or modified.
+
+    Args:
+        session_db (dict): Current session database, or None.
+        db_path (str): Path of the database file to use.
+
+    Returns:
+        dict: A session database on the current version of the file.
+    """
+    if session_db is not None:
+        if session_db["path"] == db_path and session_db["fingerprint"] == file_fingerprint(db_path):
+            return session_db
+        close_session_database(session_db)
+    return open_session_database(db_path)
+
+
+def cached_tables(session_db):
+    """Table names of a session database, read once per version of the database."""
+    if session_db["tables"] is None:
+        session_db["tables"] = table_names(session_db["engine"])
+    return session_db["tables"]
+
+
+def cached_preview(session_db, table, rows=PREVIEW_ROWS):
+    """First rows of a table as a DataFrame, read once per version of the database."""
+    if table not in session_db["previews"]:
+        quoted_table = session_db["engine"].dialect.identifier_preparer.quote(table)
+        session_db["previews"][table] = pd.read_sql_query(f"SELECT * FROM {quoted_table} LIMIT {rows}", session_db["engine"])
+    return session_db["previews"][table]
+
+
+def cached_profiles(session_db, table):
+    """Column profiles stored at conversion time for a table, read once per version of the database."""
+    if table not in session_db["profiles"]:
+        session_db["profiles"][table] = read_profiles(session_db["engine"], table)
+    return session_db["profiles"][table]
+
+
+def server_url_from_env():
+    """
+    URL of the server database configured by the DB_TYPE, DB_USERNAME, DB_PASSWORD, DB_HOSTNAME,
+    DB_PORT and DB_NAME environment variables, or None when DB_TYPE or DB_HOSTNAME is not set.
+    """
+    if not os.getenv("DB_TYPE") or not os.getenv("DB_HOSTNAME"):
+        return None
+    port = os.getenv("DB_PORT")
+    return URL.create(
+        os.getenv("DB_TYPE"),
+        username=os.getenv("DB_USERNAME"),
+        password=os.getenv("DB_PASSWORD"),
+        host=os.getenv("DB_HOSTNAME"),
+        port=int(port) if port else None,
+        database=os.getenv("DB_NAME"),
+    )
+
+
+def server_engine(url, timeout=QUERY_TIMEOUT_SECONDS):
+    """
+    Pooled engine on a PostgreSQL or MySQL server, meant to be shared by every session.
+
+    Connections are checked with a ping before use and recycled periodically. Every session
+    is read-only and its statements are cancelled by the server after `timeout` seconds.
+
+    Args:
+        url (str | sqlalchemy.URL): URL of the server database.
+        timeout (float): Statement timeout in seconds.
+
+    Returns:
+        sqlalchemy.engine.Engine: The pooled engine.
+    """
+    url = make_url(url)
+    timeout_ms = int(timeout * 1000)
+    connect_args = {}
+    if url.get_backend_name() == "postgresql":
+        connect_args["options"] = f"-c statement_timeout={timeout_ms} -c default_transaction_read_only=on"
+
+    engine = create_engine(
+        url,
+        pool_size=SERVER_POOL_SIZE,
+        max_overflow=SERVER_MAX_OVERFLOW,
+        pool_pre_ping=True,
+        pool_recycle=SERVER_POOL_RECYCLE_SECONDS,
+        connect_args=connect_args,
+    )
+
+    if url.get_backend_name() == "mysql":
+        @event.listens_for(engine, "connect")
+        def configure_mysql_session(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute(f"SET SESSION MAX_EXECUTION_TIME = {timeout_ms}")
+            cursor.execute("SET SESSION TRANSACTION READ ONLY")
+            cursor.close()
+
+    return engine
+
+
+def server_session_database(engine):
+    """Session database over the shared server engine; closing it leaves the pool open."""
+    url = engine.url.render_as_string(hide_password=True)
+    return {"path": url, "fingerprint": url, "conn": None, "engine": engine, "tables": None, "previews": {},
+            "profiles": {}, "sql_database": None}
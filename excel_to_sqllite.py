@@ -2,15 +2,36 @@ import pandas as pd
 import sqlite3
 import os
 import re
+import datetime
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
+from openpyxl import load_workbook
 
-def excel_to_sqlite(excel_file, db_file):
+from column_profiles import (copy_profiles, finish_profiles, new_profiles, store_profiles, stored_values,
+                             update_profiles)
+from csv_to_sqllite import BULK_PRAGMAS, DEFAULT_BATCH_SIZE, SAFE_PRAGMAS, apply_pragmas, widen_type
+
+
+def excel_to_sqlite(excel_file, db_file, streaming=False, batch_size=DEFAULT_BATCH_SIZE, workers=None, profile=True):
     """
     Imports all sheets of an Excel file into an SQLite database, with data type inference.
 
     Parameters:
         excel_file (str): Path to the Excel file.
         db_file (str): Path to the SQLite database file.
+        streaming (bool): Read the sheets row by row with openpyxl in read-only mode and insert them
+            in batches, so peak memory depends on `batch_size` rather than on the workbook size.
+        batch_size (int): Number of rows inserted per executemany call in streaming mode.
+        workers (int): Number of processes converting sheets concurrently in streaming mode. In both
+            streaming modes each sheet is converted on its own, so a malformed sheet fails alone
+            instead of aborting the import.
+        profile (bool): Profile every column while its rows are loaded and store the profiles in
+            the column_profiles.PROFILE_TABLE metadata table.
+
+    Returns:
+        list: Per-sheet reports (sheet, table, rows, seconds, error) in streaming mode.
     """
     # Check if Excel file exists
     if not os.path.isfile(excel_file):
@@ -21,45 +42,26 @@ def excel_to_sqlite(excel_file, db_file):
     conn = sqlite3.connect(db_file)
     cursor = conn.cursor()
 
+    sheet_reports = None
     try:
-        # Read all sheets from the Excel file into a dictionary of DataFrames
-        excel_sheets = pd.read_excel(excel_file, sheet_name=None)  # `sheet_name=None` loads all sheets
-
-        # Loop through each sheet
-        for sheet_name, df in excel_sheets.items():
-            print(f"Processing sheet: {sheet_name}")
-
-            # Clean column headers
-            headers = list(df.columns)
-            headers = [
-                re.sub(r'^(\d+)', '', header)  # Replace leading digits with ''
-                for header in headers
-            ]
-            headers = [re.sub(r'\W+', '_', header) for header in headers]  # Replace non-alphanumeric characters
-            df.columns = headers  # Update DataFrame column names
-
-            # Sanitize table name (combine Excel file name and sheet name, replacing non-alphanumeric characters)
-            base_name = os.path.splitext(os.path.basename(excel_file))[0]
-            table_name = f"{base_name}_{sheet_name}"
-            table_name = re.sub(r'\W+', '_', table_name).replace('temp_', '')
-            print(f"Table name: {table_name}")
-
-            # Infer column types and create the table
-            column_types = infer_sqlite_column_types(df)
-            create_table_sql = f"CREATE TABLE IF NOT EXISTS {table_name} ("
-            create_table_sql += ', '.join([f"{header} {col_type}" for header, col_type in zip(headers, column_types)]) + ")"
-            cursor.execute(create_table_sql)
-
-            # Insert data into table
-            insert_sql = f"INSERT INTO {table_name} ({', '.join(headers)}) VALUES ({', '.join(['?' for _ in headers])})"
-
-            # Convert empty strings or NaN values to None (NULL in SQLite)
-            df = df.where(pd.notnull(df), None)
-            cursor.executemany(insert_sql, df.values.tolist())
-
-        # Commit changes after processing all sheets
+        if streaming and workers and workers > 1:
+            sheet_reports = parallel_workbook_to_sqlite(excel_file, db_file, cursor, workers, batch_size, profile)
+        elif streaming:
+            sheet_reports = stream_workbook_to_sqlite(excel_file, db_file, cursor, batch_size, profile)
+        else:
+            pandas_workbook_to_sqlite(excel_file, cursor, profile)
+
+        # Commit changes after processing all sheets, with statistics for the query planner
+        cursor.execute("ANALYZE")
         conn.commit()
-        print(f"All sheets from '{excel_file}' have been successfully imported into '{db_file}'")
+        if streaming:
+            apply_pragmas(cursor, SAFE_PRAGMAS)
+        failed_sheets = [report["sheet"] for report in sheet_reports or [] if report["error"]]
+        if failed_sheets:
+            print(f"{len(failed_sheets)} sheets from '{excel_file}' could not be imported into '{db_file}': "
+                  f"{', '.join(failed_sheets)}")
+        else:
+            print(f"All sheets from '{excel_file}' have been successfully imported into '{db_file}'")
 
     except Exception as e:
         print(f"Error during import: {e}")
@@ -68,6 +70,356 @@ def excel_to_sqlite(excel_file, db_file):
         print("Closing connection")
         conn.close()
 
+    return sheet_reports
+
+
+def pandas_workbook_to_sqlite(excel_file, cursor, profile=True):
+    """
+    Import every sheet of a workbook by loading all of them into DataFrames at once.
+
+    Parameters:
+        excel_file (str): Path to the Excel file.
+        cursor (sqlite3.Cursor): Cursor on the target database.
+        profile (bool): Store the column profiles of every sheet.
+    """
+    # Read all sheets from the Excel file into a dictionary of DataFrames
+    excel_sheets = pd.read_excel(excel_file, sheet_name=None)  # `sheet_name=None` loads all sheets
+
+    # Loop through each sheet
+    for sheet_name, df in excel_sheets.items():
+        print(f"Processing sheet: {sheet_name}")
+
+        # Clean column headers
+        headers = clean_headers(df.columns)
+        df.columns = headers  # Update DataFrame column names
+
+        table_name = sheet_table_name(excel_file, sheet_name)
+        print(f"Table name: {table_name}")
+
+        # Infer column types and create the table
+        column_types = infer_sqlite_column_types(df)
+        create_table_sql = f"CREATE TABLE IF NOT EXISTS {table_name} ("
+        create_table_sql += ', '.join([f"{header} {col_type}" for header, col_type in zip(headers, column_types)]) + ")"
+        cursor.execute(create_table_sql)
+        # Insert data into table
+        insert_sql = f"INSERT INTO {table_name} ({', '.join(headers)}) VALUES ({', '.join(['?' for _ in headers])})"
+
+        # Convert empty strings or NaN values to None (NULL in SQLite)
+        df = df.where(pd.notnull(df), None)
+        cursor.executemany(insert_sql, df.values.tolist())
+        if profile:
+            profiles = new_profiles(len(headers))
+            update_profiles(profiles, df, column_types, cast=stored_values)
+            store_profiles(cursor, table_name, finish_profiles(cursor, table_name, headers, profiles, column_types))
+
+
+def stream_workbook_to_sqlite(excel_file, db_file, cursor, batch_size=DEFAULT_BATCH_SIZE, profile=True):
+    """
+    Import the sheets of a workbook one at a time with openpyxl read-only row iteration.
+
+    Each sheet is converted on its own by `convert_sheet`, as in the parallel path, then copied
+    into the database, so a malformed sheet fails alone instead of aborting the import.
+
+    Parameters:
+        excel_file (str): Path to the Excel file.
+        db_file (str): Path to the SQLite database file.
+        cursor (sqlite3.Cursor): Cursor on the target database.
+        batch_size (int): Number of rows inserted per executemany call.
+        profile (bool): Store the column profiles of every sheet.
+
+    Returns:
+        list: One report per sheet.
+    """
+    workbook = load_workbook(excel_file, read_only=True)
+    sheet_names = workbook.sheetnames
+    workbook.close()
+
+    apply_pragmas(cursor, BULK_PRAGMAS)
+    sheet_reports = []
+    for index, sheet_name in enumerate(sheet_names):
+        print(f"Processing sheet: {sheet_name}")
+        sheet_db_file = f"{db_file}.sheet{index}"
+        sheet_reports.append(copy_converted_sheet(
+            cursor, sheet_name, sheet_db_file,
+            lambda: convert_sheet(excel_file, sheet_name, sheet_db_file, batch_size, profile)
+        ))
+    return sheet_reports
+
+
+def parallel_workbook_to_sqlite(excel_file, db_file, cursor, workers, batch_size=DEFAULT_BATCH_SIZE, profile=True):
+    """
+    Convert the sheets of a workbook concurrently and copy them into the database one at a time.
+
+    Each worker process streams one sheet into its own temporary SQLite file; this process is the
+    single writer of `db_file` and copies the finished sheets in workbook order. A worker crash
+    breaks the pool, so the sheets it left unfinished are converted again one at a time, see
+    `sheet_result`.
+
+    Parameters:
+        excel_file (str): Path to the Excel file.
+        db_file (str): Path to the SQLite database file.
+        cursor (sqlite3.Cursor): Cursor on the target database.
+        workers (int): Number of worker processes.
+        batch_size (int): Number of rows inserted per executemany call.
+        profile (bool): Store the column profiles of every sheet.
+
+    Returns:
+        list: One report per sheet.
+    """
+    workbook = load_workbook(excel_file, read_only=True)
+    sheet_names = workbook.sheetnames
+    workbook.close()
+
+    apply_pragmas(cursor, BULK_PRAGMAS)
+    sheet_reports = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(convert_sheet, excel_file, sheet_name, f"{db_file}.sheet{index}", batch_size, profile)
+            for index, sheet_name in enumerate(sheet_names)
+        ]
+        for index, (sheet_name, future) in enumerate(zip(sheet_names, futures)):
+            sheet_db_file = f"{db_file}.sheet{index}"
+            sheet_reports.append(copy_converted_sheet(
+                cursor, sheet_name, sheet_db_file,
+                lambda: sheet_result(future, excel_file, sheet_name, sheet_db_file, batch_size, profile)
+            ))
+    return sheet_reports
+
+
+def sheet_result(future, excel_file, sheet_name, sheet_db_file, batch_size=DEFAULT_BATCH_SIZE, profile=True):
+    """
+    Return the report of a sheet converted in the shared pool, converting it again on its own if
+    a crashed worker broke the pool before the sheet was done.
+
+    The retry runs in a fresh single-worker pool, so a sheet that crashes its worker again only
+    fails itself, while the sheets that were merely pending in the broken pool go through.
+    """
+    try:
+        return future.result()
+    except BrokenProcessPool:
+        # The interrupted attempt may have left a partly filled sheet file
+        for path in (sheet_db_file, f"{sheet_db_file}.staging"):
+            if os.path.exists(path):
+                os.remove(path)
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            return executor.submit(convert_sheet, excel_file, sheet_name, sheet_db_file, batch_size, profile).result()
+
+
+def copy_converted_sheet(cursor, sheet_name, sheet_db_file, convert):
+    """
+    Wait for a sheet conversion, copy the converted table into the database and report the outcome.
+
+    Parameters:
+        cursor (sqlite3.Cursor): Cursor on the target database.
+        sheet_name (str): Name of the sheet.
+        sheet_db_file (str): Temporary SQLite file the sheet is converted into, removed afterwards.
+        convert (callable): Returns the report of `convert_sheet` for the sheet.
+
+    Returns:
+        dict: Report of the sheet, with the error of a failed conversion or copy.
+    """
+    try:
+        report = convert()
+        if report["error"] is None and report["table"]:
+            copy_sheet_table(cursor, sheet_db_file, report["table"])
+    except Exception as e:
+        # Covers a sheet that crashed its worker as well as a failed copy; the other sheets still go through
+        cursor.connection.rollback()
+        report = {"sheet": sheet_name, "table": None, "rows": 0, "seconds": 0.0, "error": str(e)}
+    finally:
+        if os.path.exists(sheet_db_file):
+            os.remove(sheet_db_file)
+
+    if report["error"]:
+        print(f"Sheet '{sheet_name}' failed after {report['seconds']:.2f}s: {report['error']}")
+    elif report["table"] is None:
+        print(f"Sheet '{sheet_name}' is empty, skipping")
+    else:
+        print(f"Sheet '{sheet_name}' -> {report['table']}: {report['rows']} rows in {report['seconds']:.2f}s")
+    return report
+
+
+def convert_sheet(excel_file, sheet_name, sheet_db_file, batch_size=DEFAULT_BATCH_SIZE, profile=True):
+    """
+    Stream one sheet into its own SQLite file (in a worker process when sheets are converted in parallel).
+
+    Errors are caught and reported rather than raised, so one malformed sheet does not
+    affect the others.
+
+    Returns:
+        dict: Sheet name, table name (None for an empty sheet), row count, seconds and error message.
+    """
+    start_time = time.perf_counter()
+    report = {"sheet": sheet_name, "table": None, "rows": 0, "seconds": 0.0, "error": None}
+    staging_file = f"{sheet_db_file}.staging"
+    conn = sqlite3.connect(sheet_db_file)
+    cursor = conn.cursor()
+    try:
+        # The sheet file is temporary, so it does not need to survive a crash
+        apply_pragmas(cursor, [("journal_mode", "OFF"), ("synchronous", "OFF")])
+        cursor.execute("ATTACH DATABASE ? AS staging", (staging_file,))
+        apply_pragmas(cursor, [("staging.journal_mode", "OFF"), ("staging.synchronous", "OFF")])
+
+        workbook = load_workbook(excel_file, read_only=True, data_only=True)
+        try:
+            rows = workbook[sheet_name].iter_rows(values_only=True)
+            header_row = next(rows, None)
+            if header_row is not None:
+                report["table"] = sheet_table_name(excel_file, sheet_name)
+                report["rows"] = stream_rows_to_table(cursor, report["table"], sheet_headers(header_row), rows,
+                                                      batch_size, profile)
+        finally:
+            workbook.close()
+        conn.commit()
+    except Exception as e:
+        report["error"] = str(e)
+    finally:
+        conn.close()
+        if os.path.exists(staging_file):
+            os.remove(staging_file)
+    report["seconds"] = time.perf_counter() - start_time
+    return report
+
+
+def copy_sheet_table(cursor, sheet_db_file, table_name):
+    """Copy a table converted by a worker, and its profiles, into the main database, keeping its declared types."""
+    cursor.execute("ATTACH DATABASE ? AS sheet", (sheet_db_file,))
+    try:
+        create_sql = cursor.execute(
+            "SELECT sql FROM sheet.sqlite_master WHERE type = 'table' AND name = ?", (table_name,)
+        ).fetchone()[0]
+        cursor.execute(create_sql.replace("CREATE TABLE", "CREATE TABLE IF NOT EXISTS", 1))
+        cursor.execute(f"INSERT INTO main.{table_name} SELECT * FROM sheet.{table_name}")
+        copy_profiles(cursor, "sheet", table_name)
+        cursor.connection.commit()
+    finally:
+        cursor.execute("DETACH DATABASE sheet")
+
+
+def stream_rows_to_table(cursor, table_name, headers, rows, batch_size=DEFAULT_BATCH_SIZE, profile=True):
+    """
+    Stage rows of cell values in bounded batches, then create and fill the typed table.
+
+    Parameters:
+        cursor (sqlite3.Cursor): Cursor with the `staging` database attached.
+        table_name (str): Name of the table to create.
+        headers (list): Cleaned column names.
+        rows (iterator): Tuples of cell values, header row excluded.
+        batch_size (int): Number of rows inserted per executemany call.
+        profile (bool): Profile the columns batch by batch and store the profiles next to the table.
+
+    Returns:
+        int: Number of rows inserted.
+    """
+    num_columns = len(headers)
+    cursor.execute(f"DROP TABLE IF EXISTS staging.{table_name}")
+    cursor.execute(f"CREATE TABLE staging.{table_name} ({', '.join(headers)})")
+    insert_sql = f"INSERT INTO staging.{table_name} ({', '.join(headers)}) VALUES ({', '.join(['?' for _ in headers])})"
+
+    column_types = [None] * num_columns
+    profiles = new_profiles(num_columns) if profile else None
+    row_count = 0
+    batch = []
+    for row in rows:
+        values = [cell_to_sqlite(value) for value in row[:num_columns]]
+        if all(value is None for value in values):
+            continue  # Skip blank rows
+        values += [None] * (num_columns - len(values))
+        column_types = [widen_type(column_type, value_type(value)) for column_type, value in zip(column_types, values)]
+        batch.append(values)
+        row_count += 1
+        if len(batch) >= batch_size:
+            if profiles is not None:
+                update_profiles(profiles, batch, column_types, cast=stored_values)
+            cursor.executemany(insert_sql, batch)
+            batch = []
+    if batch:
+        if profiles is not None:
+            update_profiles(profiles, batch, column_types, cast=stored_values)
+        cursor.executemany(insert_sql, batch)
+
+    # Columns without any value are REAL, as pandas reads them as all-NaN float columns
+    column_types = [column_type or "REAL" for column_type in column_types]
+    create_table_sql = f"CREATE TABLE IF NOT EXISTS {table_name} ("
+    create_table_sql += ', '.join([f"{header} {col_type}" for header, col_type in zip(headers, column_types)]) + ")"
+    cursor.execute(create_table_sql)
+    cursor.execute(f"INSERT INTO main.{table_name} SELECT * FROM staging.{table_name}")
+    cursor.execute(f"DROP TABLE staging.{table_name}")
+    if profiles is not None:
+        store_profiles(cursor, table_name, finish_profiles(cursor, table_name, headers, profiles, column_types))
+    return row_count
+
+
+def cell_to_sqlite(value):
+    """Convert an openpyxl cell value to a value SQLite can store."""
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(sep=' ')  # Store dates as TEXT in ISO 8601 format
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return str(value)
+    if isinstance(value, str) and value.strip() == '':
+        return None
+    return value
+
+
+def value_type(value):
+    """SQLite column type of a single converted cell value, or None for an empty cell."""
+    if value is None:
+        return None
+    if isinstance(value, (bool, int)):
+        return "INTEGER"  # SQLite has no BOOLEAN type, so we use INTEGER
+    if isinstance(value, float):
+        return "REAL"
+    return "TEXT"
+
+
+def sheet_headers(header_row):
+    """Clean the header row of a sheet, naming empty and duplicate header cells like pandas does."""
+    return clean_headers(deduplicate_headers(
+        [header if header is not None else f"Unnamed: {index}" for index, header in enumerate(header_row)]
+    ))
+
+
+def deduplicate_headers(headers):
+    """
+    Rename repeated headers like `pd.read_excel` does: every repeat of a header gets the first
+    free `.1`, `.2`... suffix, so that `Nom, Nom, Prix` becomes `Nom, Nom.1, Prix`.
+    """
+    taken = set(headers)
+    seen = set()
+    suffixes = {}
+    deduplicated = []
+    for header in headers:
+        if header in seen:
+            suffix = suffixes.get(header, 0)
+            while True:
+                suffix += 1
+                if f"{header}.{suffix}" not in taken:
+                    break
+            suffixes[header] = suffix
+            header = f"{header}.{suffix}"
+            taken.add(header)
+        seen.add(header)
+        deduplicated.append(header)
+    return deduplicated
+
+
+def clean_headers(headers):
+    """Make column headers SQL-compliant."""
+    headers = [
+        re.sub(r'^(\d+)', '', str(header))  # Replace leading digits with ''
+        for header in headers
+    ]
+    return [re.sub(r'\W+', '_', header) for header in headers]  # Replace non-alphanumeric characters
+
+
+def sheet_table_name(excel_file, sheet_name):
+    """Sanitize table name (combine Excel file name and sheet name, replacing non-alphanumeric characters)."""
+    base_name = os.path.splitext(os.path.basename(excel_file))[0]
+    table_name = f"{base_name}_{sheet_name}"
+    return re.sub(r'\W+', '_', table_name).replace('temp_', '')
+
 
 def infer_sqlite_column_types(df):
     """
@@ -0,0 +1,107 @@
+import os
+import sqlite3
+import time
+
+# Append-only SQLite store of the questions and answers shared by all sessions before they had
+# their own workspace; sessions now keep their history in their workspace and never read it
+HISTORY_DB_PATH = "data/conversation_history.sqlite"
+
+# Text file used for the history before the SQLite store, imported once
+LEGACY_HISTORY_PATH = "conversation_history.txt"
+
+# Number of turns shown per page of history
+HISTORY_PAGE_SIZE = 20
+
+
+def connect(db_path=HISTORY_DB_PATH):
+    """Open the history store, creating its table and timestamp index if needed."""
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS conversation_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at REAL,
+            question TEXT,
+            answer TEXT
+        )"""
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_conversation_history_created_at ON conversation_history (created_at)")
+    return conn
+
+
+def append_turn(question, answer, db_path=HISTORY_DB_PATH):
+    """Append a question and its answer to the history."""
+    conn = connect(db_path)
+    try:
+        conn.execute(
+            "INSERT INTO conversation_history (created_at, question, answer) VALUES (?, ?, ?)",
+            (time.time(), question, answer.replace("Answer:", "")),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def load_recent_turns(limit=HISTORY_PAGE_SIZE, db_path=HISTORY_DB_PATH):
+    """
+    Load the most recent turns of the history, newest first.
+
+    Only `limit` rows are read through the timestamp index, so the cost does not grow
+    with the size of the history.
+
+    Args:
+        limit (int): Number of turns to load.
+        db_path (str): Path of the history store.
+
+    Returns:
+        list: (created_at, question, answer) tuples.
+    """
+    conn = connect(db_path)
+    try:
+        return conn.execute(
+            "SELECT created_at, question, answer FROM conversation_history "
+            "ORDER BY created_at DESC, id DESC LIMIT ?",
+            (limit,),
+        ).fetchall()
+    finally:
+        conn.close()
+
+
+def import_legacy_history(text_path=LEGACY_HISTORY_PATH, db_path=HISTORY_DB_PATH):
+    """
+    Move the turns of the old text history into the store, then rename the text file.
+
+    The text file holds 'user: ' and 'BABot: ' lines with newlines encoded as ':newligne:'.
+    It is renamed before it is read, so concurrent sessions import it only once.
+
+    Returns:
+        int: Number of turns imported.
+    """
+    imported_path = f"{text_path}.imported"
+    try:
+        os.replace(text_path, imported_path)
+    except FileNotFoundError:
+        return 0  # Already imported, or there never was a text history
+    turns = []
+    question = None
+    with open(imported_path, "r") as file:
+        for line in file:
+            line = line.rstrip("\n").replace(":newligne:", "\n")
+            if line.startswith("user: "):
+                question = line[len("user: "):]
+            elif line.startswith("BABot: ") and question is not None:
+                turns.append((question, line[len("BABot: "):]))
+                question = None
+
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    conn = connect(db_path)
+    try:
+        # The old file has no timestamps; consecutive values keep the turns in order
+        start = time.time() - len(turns)
+        conn.executemany(
+            "INSERT INTO conversation_history (created_at, question, answer) VALUES (?, ?, ?)",
+            [(start + i, question, answer) for i, (question, answer) in enumerate(turns)],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    return len(turns)
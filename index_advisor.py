@@ -0,0 +1,231 @@
+import re
+import sqlite3
+import time
+from collections import Counter
+
+from conversion_cache import unpin_entry
+from csv_to_sqllite import create_indexes
+from sql_guard import table_aliases
+
+# SQLite file holding the executed queries and the column usage parsed from them
+QUERY_LOG_PATH = "data/query_log.sqlite"
+
+# Number of queries using a column (or group of columns) before an index is built for it
+INDEX_USAGE_THRESHOLD = 3
+
+# Build the proposed indexes right away; when False they are only returned as proposals
+AUTO_BUILD_INDEXES = True
+
+# Clauses whose columns benefit from an index, with the keywords ending each clause
+CLAUSE_PATTERNS = {
+    "filter": r"\bwhere\b(.*?)(?=\bgroup\s+by\b|\border\s+by\b|\bhaving\b|\blimit\b|\bunion\b|$)",
+    "join": r"\bon\b(.*?)(?=\b(?:inner|left|right|full|cross)?\s*join\b|\bwhere\b|\bgroup\s+by\b|\border\s+by\b|\blimit\b|$)",
+    "group": r"\bgroup\s+by\b(.*?)(?=\bhaving\b|\border\s+by\b|\blimit\b|\bunion\b|$)",
+}
+
+
+def connect(db_path=QUERY_LOG_PATH):
+    """Open the query log, creating its tables if needed."""
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE IF NOT EXISTS query_log (db_id TEXT, sql TEXT, executed_at REAL)")
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS column_usage (
+            db_id TEXT,
+            table_name TEXT,
+            columns TEXT,
+            kind TEXT,
+            count INTEGER,
+            PRIMARY KEY (db_id, table_name, columns, kind)
+        )"""
+    )
+    return conn
+
+
+def table_columns(conn):
+    """Map each table of an SQLite database to the lower-cased names of its columns."""
+    tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+    return {
+        table: [row[1].lower() for row in conn.execute(f'PRAGMA table_info("{table}")')]
+        for table in tables
+    }
+
+
+def extract_column_usage(sql, schema):
+    """
+    Find the columns a query filters, joins and groups on.
+
+    The parsing is lexical: string literals are dropped, the WHERE, ON and GROUP BY
+    clauses are cut out, and the identifiers in them are resolved against the schema,
+    through the table aliases of the query for qualified names.
+
+    Args:
+        sql (str): Executed query.
+        schema (dict): Table name -> column names, as returned by `table_columns`.
+
+    Returns:
+        list: (table, columns tuple, kind) entries. Tables filtered on several columns also
+            get a multi-column "filter" entry.
+    """
+    text = re.sub(r"'(?:[^']|'')*'", "''", sql)
+    text = re.sub(r'"(\w+)"', r"\1", text).lower()
+    tables_by_name = {table.lower(): table for table in schema}
+    aliases = {alias: table.lower() for alias, table in table_aliases(text).items()}
+    query_tables = [
+        table for table in tables_by_name if re.search(rf"\b(?:from|join)\s+{re.escape(table)}\b", text)
+    ]
+
+    usages = []
+    filtered_columns = {}
+    for kind, pattern in CLAUSE_PATTERNS.items():
+        for clause in re.findall(pattern, text, flags=re.DOTALL):
+            for qualifier, column in re.findall(r"\b(?:(\w+)\.)?(\w+)\b", clause):
+                table = resolve_column(qualifier, column, aliases, query_tables, tables_by_name, schema)
+                if table is None:
+                    continue
+                usages.append((table, (column,), kind))
+                if kind == "filter":
+                    filtered_columns.setdefault(table, set()).add(column)
+
+    for table, columns in filtered_columns.items():
+        if len(columns) > 1:
+            usages.append((table, tuple(sorted(columns)), "filter"))
+    return sorted(set(usages))
+
+
+def resolve_column(qualifier, column, aliases, query_tables, tables_by_name, schema):
+    """Return the table a column reference belongs to, or None if it is not a known column."""
+    if qualifier:
+        table = tables_by_name.get(aliases.get(qualifier, qualifier))
+        return table if table is not None and column in schema[table] else None
+    candidates = [tables_by_name[name] for name in query_tables if column in schema[tables_by_name[name]]]
+    return candidates[0] if len(candidates) == 1 else None
+
+
+def record_query(db_id, sql, schema, db_path=QUERY_LOG_PATH):
+    """
+    Append an executed query to the log and count the columns it uses.
+
+    Args:
+        db_id (str): Identifier of the queried database.
+        sql (str): Executed query.
+        schema (dict): Table name -> column names of the queried database.
+        db_path (str): Path of the query log.
+    """
+    conn = connect(db_path)
+    try:
+        conn.execute("INSERT INTO query_log (db_id, sql, executed_at) VALUES (?, ?, ?)", (db_id, sql, time.time()))
+        conn.executemany(
+            "INSERT INTO column_usage (db_id, table_name, columns, kind, count) VALUES (?, ?, ?, ?, 1) "
+            "ON CONFLICT(db_id, table_name, columns, kind) DO UPDATE SET count = count + 1",
+            [(db_id, table, ",".join(columns), kind) for table, columns, kind in extract_column_usage(sql, schema)],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def propose_indexes(db_id, threshold=INDEX_USAGE_THRESHOLD, db_path=QUERY_LOG_PATH):
+    """
+    Propose the indexes worth building from the recorded column usage.
+
+    Columns used at least `threshold` times in filters, joins or groupings get a single-column
+    index, and groups of columns filtered together that often get a multi-column index, most
+    used column first.
+
+    Returns:
+        list: (table, columns tuple) proposals, multi-column ones first so that they cover the
+            single-column proposals sharing their leading column.
+    """
+    conn = connect(db_path)
+    try:
+        rows = conn.execute(
+            "SELECT table_name, columns, SUM(count) FROM column_usage WHERE db_id = ? GROUP BY table_name, columns",
+            (db_id,),
+        ).fetchall()
+    finally:
+        conn.close()
+
+    column_counts = Counter({(table, columns): count for table, columns, count in rows if "," not in columns})
+    proposals = []
+    for table, columns, count in rows:
+        if count < threshold:
+            continue
+        columns = columns.split(",")
+        columns.sort(key=lambda column: -column_counts[(table, column)])
+        proposals.append((table, tuple(columns)))
+    return sorted(proposals, key=lambda proposal: -len(proposal[1]))
+
+
+def build_indexes(conn, proposals):
+    """
+    Create the proposed indexes that no existing index already covers, then run ANALYZE.
+
+    Args:
+        conn (sqlite3.Connection): Writable connection on the analysed database.
+        proposals (list): (table, columns tuple) entries from `propose_indexes`.
+
+    Returns:
+        list: The (table, columns) indexes created.
+    """
+    created = []
+    cursor = conn.cursor()
+    for table, columns in proposals:
+        if index_covers(conn, table, columns):
+            continue
+        create_indexes(cursor, table, [columns])
+        created.append((table, columns))
+    if created:
+        cursor.execute("ANALYZE")
+        conn.commit()
+    return created
+
+
+def index_covers(conn, table, columns):
+    """True if an existing index of `table` starts with `columns`."""
+    for index in conn.execute(f'PRAGMA index_list("{table}")').fetchall():
+        index_columns = tuple(row[2].lower() for row in conn.execute(f'PRAGMA index_info("{index[1]}")'))
+        if index_columns[:len(columns)] == tuple(columns):
+            return True
+    return False
+
+
+def tune_indexes(db_id, sql, engine, db_path=None, auto_build=AUTO_BUILD_INDEXES):
+    """
+    Log a successfully executed query and index the columns the workload keeps using.
+
+    Only SQLite databases are tuned.
+
+    Args:
+        db_id (str): Identifier of the queried database, stable across its versions.
+        sql (str): Executed query.
+        engine (sqlalchemy.engine.Engine): Engine of the database, possibly read-only.
+        db_path (str): Database file, opened for writing to build the indexes; None to build
+            them through the engine, for a database held in memory. A file linked to the
+            conversion cache is first replaced by a private copy.
+        auto_build (bool): Build the proposed indexes instead of only returning them.
+
+    Returns:
+        list: The indexes created, or the proposals when `auto_build` is False.
+    """
+    raw_conn = engine.raw_connection()
+    try:
+        driver_conn = raw_conn.driver_connection
+        if not isinstance(driver_conn, sqlite3.Connection):
+            return []
+        record_query(db_id, sql, table_columns(driver_conn))
+        proposals = propose_indexes(db_id)
+        if not auto_build:
+            return proposals
+        proposals = [(table, columns) for table, columns in proposals if not index_covers(driver_conn, table, columns)]
+        if not proposals:
+            return []
+        if db_path is None:
+            return build_indexes(driver_conn, proposals)
+    finally:
+        raw_conn.close()
+
+    write_conn = sqlite3.connect(unpin_entry(db_path))
+    try:
+        return build_indexes(write_conn, proposals)
+    finally:
+        write_conn.close()
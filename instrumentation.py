@@ -0,0 +1,139 @@
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+
+import pandas as pd
+
+# JSON Lines file receiving one record per executed stage
+METRICS_LOG_PATH = "data/metrics.jsonl"
+
+# Number of most recent records the metrics panel summarizes
+RECENT_RECORDS = 2000
+
+# Bytes read at a time when scanning the log backwards for its last records
+TAIL_BLOCK_BYTES = 64 * 1024
+
+
+def new_run_id():
+    """Identifier grouping the stages of one question or one upload."""
+    return uuid.uuid4().hex
+
+
+@contextmanager
+def stage(name, run_id, log_path=METRICS_LOG_PATH, **fields):
+    """
+    Time a stage and append its record to the metrics log.
+
+    The record is yielded so that the stage can add its own measurements (rows, prompt and
+    completion tokens, cache hits...). A failing stage is logged with its error, then re-raised.
+
+    Example:
+        with stage("sql_execution", run_id) as record:
+            result, truncated = execute_sql(sql, engine)
+            record["rows"] = len(result)
+    """
+    record = {"run_id": run_id, "stage": name, "started_at": time.time(), **fields}
+    start = time.perf_counter()
+    try:
+        yield record
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        record["seconds"] = time.perf_counter() - start
+        append_record(record, log_path)
+
+
+def append_record(record, log_path=METRICS_LOG_PATH):
+    """Append one record to the metrics log."""
+    os.makedirs(os.path.dirname(log_path) or ".", exist_ok=True)
+    with open(log_path, "a", encoding="utf-8") as file:
+        file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+
+def token_usage(message):
+    """
+    Prompt and completion token counts reported with a LangChain message or message chunk.
+
+    Returns:
+        dict: prompt_tokens and completion_tokens, empty when the model reported no usage.
+    """
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        return {"prompt_tokens": usage.get("input_tokens", 0), "completion_tokens": usage.get("output_tokens", 0)}
+    usage = (getattr(message, "response_metadata", None) or {}).get("token_usage")
+    if usage:
+        return {"prompt_tokens": usage.get("prompt_tokens", 0), "completion_tokens": usage.get("completion_tokens", 0)}
+    return {}
+
+
+def add_token_usage(record, message):
+    """Add the token counts of a message to a record, summing with counts already there."""
+    if record is None:
+        return
+    for key, count in token_usage(message).items():
+        record[key] = record.get(key, 0) + count
+
+
+def recent_records(limit=RECENT_RECORDS, log_path=METRICS_LOG_PATH):
+    """
+    Read the last `limit` records of the metrics log.
+
+    The file is read backwards block by block, so the cost depends on `limit` rather than
+    on the size of the log.
+    """
+    if not os.path.exists(log_path):
+        return []
+    with open(log_path, "rb") as file:
+        file.seek(0, os.SEEK_END)
+        position = file.tell()
+        data = b""
+        # One more line than needed, as the first one read may be cut
+        while position > 0 and data.count(b"\n") <= limit:
+            read_size = min(TAIL_BLOCK_BYTES, position)
+            position -= read_size
+            file.seek(position)
+            data = file.read(read_size) + data
+    lines = data.splitlines()
+    if position > 0:
+        lines = lines[1:]
+    records = []
+    for line in lines[-limit:]:
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            continue  # Line being written by another session
+    return records
+
+
+def stage_summary(records):
+    """
+    Summarize the records per stage: count, p50 and p95 wall time, average rows and tokens,
+    cache hit rate and number of errors.
+
+    Returns:
+        pd.DataFrame: One row per stage, in order of first appearance.
+    """
+    if not records:
+        return pd.DataFrame()
+    df = pd.DataFrame.from_records(records)
+    for column in ("rows", "prompt_tokens", "completion_tokens", "cache_hit", "error"):
+        if column not in df.columns:
+            df[column] = None
+    for column in ("rows", "prompt_tokens", "completion_tokens"):
+        df[column] = pd.to_numeric(df[column], errors="coerce")
+    df["cache_hit"] = df["cache_hit"].map({True: 1.0, False: 0.0})
+    grouped = df.groupby("stage", sort=False)
+    summary = pd.DataFrame({
+        "count": grouped.size(),
+        "p50_s": grouped["seconds"].quantile(0.5),
+        "p95_s": grouped["seconds"].quantile(0.95),
+        "avg_rows": grouped["rows"].mean(),
+        "avg_prompt_tokens": grouped["prompt_tokens"].mean(),
+        "avg_completion_tokens": grouped["completion_tokens"].mean(),
+        "cache_hit_rate": grouped["cache_hit"].mean(),
+        "errors": grouped["error"].count(),
+    })
+    return summary.reset_index()
@@ -0,0 +1,104 @@
+import sqlite3
+import time
+
+import pandas as pd
+from sqlalchemy import text
+
+from csv_to_sqllite import create_indexes
+
+# Number of rows fetched from the server-side cursor and written to SQLite at a time
+EXTRACT_CHUNK_ROWS = 50000
+
+# Table of the SQLite database recording how far each extracted table has been loaded
+WATERMARK_TABLE = "extract_watermarks"
+
+
+def extract_incremental(source_engine, sqlite_path, table_name, source_table, columns, watermark_column,
+                        start=None, end=None, chunk_size=EXTRACT_CHUNK_ROWS):
+    """
+    Copy the rows of a server table into SQLite, fetching only the rows added since the last run.
+
+    Rows are read in `watermark_column` order through a server-side cursor and appended to
+    SQLite chunk by chunk, so memory use is bounded by `chunk_size`. After each chunk the
+    largest `watermark_column` value is saved; the next run deletes and fetches again the rows
+    at that value, which may have grown since, and everything after it. The table is indexed on
+    `watermark_column` when it is created, so that this deletion does not scan it.
+
+    Args:
+        source_engine (sqlalchemy.engine.Engine): Engine of the source database (PostgreSQL).
+        sqlite_path (str): Path of the target SQLite database.
+        table_name (str): Target table in SQLite.
+        source_table (str): Table to extract from.
+        columns (list): Columns to extract; they must include `watermark_column`.
+        watermark_column (str): Increasing column (e.g. a date) used to find the new rows.
+        start: Lower bound of `watermark_column` for the first run.
+        end: Optional upper bound of `watermark_column`.
+        chunk_size (int): Number of rows per chunk.
+
+    Returns:
+        int: Number of rows written to SQLite.
+    """
+    start_time = time.perf_counter()
+    sqlite_conn = sqlite3.connect(sqlite_path)
+    try:
+        sqlite_conn.execute(f"CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE} (table_name TEXT PRIMARY KEY, watermark TEXT)")
+        watermark = read_watermark(sqlite_conn, table_name)
+        if watermark is None:
+            # Without a watermark the table is rebuilt from `start`
+            sqlite_conn.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+            since = start
+        else:
+            if table_exists(sqlite_conn, table_name):
+                sqlite_conn.execute(f'DELETE FROM "{table_name}" WHERE {watermark_column} >= ?', (watermark,))
+            since = watermark
+        sqlite_conn.commit()
+
+        conditions, params = [], {}
+        if since is not None:
+            conditions.append(f"{watermark_column} >= :since")
+            params["since"] = since
+        if end is not None:
+            conditions.append(f"{watermark_column} <= :until")
+            params["until"] = end
+        query = f"SELECT {', '.join(columns)} FROM {source_table}"
+        if conditions:
+            query += f" WHERE {' AND '.join(conditions)}"
+        query += f" ORDER BY {watermark_column}"
+
+        row_count = 0
+        # stream_results makes psycopg2 use a named, server-side cursor, so rows arrive chunk by chunk
+        with source_engine.connect().execution_options(stream_results=True, max_row_buffer=chunk_size) as source_conn:
+            for chunk in pd.read_sql_query(text(query), source_conn, params=params, chunksize=chunk_size):
+                new_table = not table_exists(sqlite_conn, table_name)
+                chunk.to_sql(table_name, sqlite_conn, index=False, if_exists="append")
+                if new_table:
+                    create_indexes(sqlite_conn.cursor(), table_name, [watermark_column])
+                write_watermark(sqlite_conn, table_name, str(chunk[watermark_column].max()))
+                sqlite_conn.commit()
+                row_count += len(chunk)
+                print(f"{row_count} rows of {source_table} written to {table_name}")
+    finally:
+        sqlite_conn.close()
+
+    print(f"Extracted {row_count} rows from {source_table} in {time.perf_counter() - start_time:.2f}s")
+    return row_count
+
+
+def read_watermark(conn, table_name):
+    """Return the saved watermark of a table, or None if it was never extracted."""
+    row = conn.execute(f"SELECT watermark FROM {WATERMARK_TABLE} WHERE table_name = ?", (table_name,)).fetchone()
+    return row[0] if row else None
+
+
+def write_watermark(conn, table_name, watermark):
+    """Save the watermark of a table."""
+    conn.execute(
+        f"INSERT INTO {WATERMARK_TABLE} (table_name, watermark) VALUES (?, ?) "
+        "ON CONFLICT(table_name) DO UPDATE SET watermark = excluded.watermark",
+        (table_name, watermark),
+    )
+
+
+def table_exists(conn, table_name):
+    """True if the SQLite database has a table of that name."""
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name = ?", (table_name,)).fetchone() is not None
@@ -0,0 +1,97 @@
+import re
+import string
+
+import pandas as pd
+
+# SQLite's LIKE ignores case for ASCII letters only
+ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def like_prefix_matches(values, prefixes):
+    """
+    Pair values with the prefixes they match, as `value LIKE prefix || '%'` does in SQLite.
+
+    Prefixes without wildcards go into a dictionary keyed by their case-folded text, so each
+    value is only looked up once per distinct prefix length instead of compared with every
+    prefix. The few prefixes holding '%' or '_' wildcards are matched with a regular expression.
+
+    Args:
+        values (iterable): (key, text) pairs; None texts match nothing.
+        prefixes (list): Prefix texts; None prefixes match nothing.
+
+    Yields:
+        tuple: (key, prefix index) for each match, in the order of `values`, then of `prefixes`.
+    """
+    literal_prefixes = {}
+    wildcard_prefixes = []
+    for index, prefix in enumerate(prefixes):
+        if prefix is None:
+            continue
+        if "%" in prefix or "_" in prefix:
+            wildcard_prefixes.append((index, like_regex(prefix)))
+        else:
+            literal_prefixes.setdefault(prefix.translate(ASCII_LOWER), []).append(index)
+    lengths = sorted({len(prefix) for prefix in literal_prefixes})
+
+    for key, text in values:
+        if text is None:
+            continue
+        folded = text.translate(ASCII_LOWER)
+        matches = [
+            index
+            for length in lengths
+            if length <= len(folded)
+            for index in literal_prefixes.get(folded[:length], ())
+        ]
+        matches.extend(index for index, regex in wildcard_prefixes if regex.match(text))
+        for index in sorted(matches):
+            yield key, index
+
+
+def like_regex(prefix):
+    """Regular expression matching the texts that start like the LIKE pattern `prefix`."""
+    pattern = "".join(".*" if char == "%" else "." if char == "_" else re.escape(char) for char in prefix)
+    return re.compile(pattern, re.DOTALL | re.IGNORECASE | re.ASCII)
+
+
+def materialize_prefix_join(engine, target_table, table, columns, column, prefix_table, prefix_column):
+    """
+    Materialize `SELECT columns FROM table INNER JOIN prefix_table ON column LIKE prefix_column || '%'`.
+
+    The nested loop of LIKE comparisons is replaced by a single pass over `table` with
+    `like_prefix_matches`; the matched rows are then read back by rowid and written with
+    `to_sql`, as the SQL version of the step did. Rows come in `table` order.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): Engine of the SQLite database.
+        target_table (str): Table replaced by the join result.
+        table (str): Table whose rows are selected.
+        columns (list): Columns of `table` to keep.
+        column (str): Column of `table` matched against the prefixes.
+        prefix_table (str): Table holding the prefixes.
+        prefix_column (str): Column of the prefixes.
+
+    Returns:
+        pd.DataFrame: The join result.
+    """
+    with engine.connect() as conn:
+        # Both sides are compared as text, like LIKE and || do
+        prefixes = [
+            row[0] for row in conn.exec_driver_sql(f"SELECT CAST({prefix_column} AS TEXT) FROM {prefix_table} ORDER BY rowid")
+        ]
+        values = conn.exec_driver_sql(f"SELECT rowid, CAST({column} AS TEXT) FROM {table} ORDER BY rowid")
+        matched_rowids = [(rowid,) for rowid, _ in like_prefix_matches(values, prefixes)]
+
+        conn.exec_driver_sql("CREATE TEMP TABLE prefix_matches (seq INTEGER PRIMARY KEY, row_id INTEGER)")
+        if matched_rowids:
+            conn.exec_driver_sql("INSERT INTO prefix_matches (row_id) VALUES (?)", matched_rowids)
+        select_columns = ", ".join(f"{table}.{name}" for name in columns)
+        df = pd.read_sql_query(
+            f"SELECT {select_columns} FROM prefix_matches "
+            f"JOIN {table} ON {table}.rowid = prefix_matches.row_id ORDER BY prefix_matches.seq",
+            conn,
+        )
+        conn.exec_driver_sql("DROP TABLE prefix_matches")
+
+    df.to_sql(target_table, engine, index=False, if_exists='replace')
+    return df
@@ -0,0 +1,167 @@
+import re
+
+from langchain.prompts import PromptTemplate
+from langchain_community.utilities import SQLDatabase
+
+from column_profiles import profile_comment, read_profiles
+from db_connections import table_names
+from instrumentation import add_token_usage
+from result_compaction import answer_token_budget, compact_result
+from sql_guard import guarded_execute
+
+# Prompt generating the SQL query for a question
+SQL_PROMPT = PromptTemplate(
+    input_variables=["input", "table_info"],
+    template=(
+        "You are a highly skilled SQL expert tasked with answering questions using database information. "
+        "Given the user's question: '{input}' and the database schema details: '{table_info}', follow these precise instructions:\n\n"
+        "1. **Generate the most appropriate SQL query** to answer the user's question based on the given schema. Ensure the query is optimized and accurate.\n"
+        "2. Handle errors gracefully, providing actionable suggestions if needed.\n"
+        "3. **Do not include any Markdown formatting** at the beginning and end of the sql query (e.g., ```sql).\n"
+        "4. Use double quotes for any column or table names that contain special characters or spaces.\n"
+        "5. Do not provide any explanations. Just the SQL query code.\n"
+        "6. ** Remove all Markdown formatting ** at the beginning and end of the sql query (e.g., ```sql).\n"
+    )
+)
+
+# Prompt turning the query result into an answer in French
+ANSWER_PROMPT = PromptTemplate(
+    input_variables=["input", "query_result"],
+    template=(
+        "You are a highly skilled SQL expert tasked with answering questions using database information. "
+        "Given the user's question: '{input}' and the query result: '{query_result}', follow these precise instructions:\n\n"
+        "1. **Generate the answer in French** based on the user's question and the query result.\n"
+        "2. Make sure the answer is always in proper French and reflects the query result.\n"
+    )
+)
+
+# Answer given without calling the LLM when the query returns no row
+EMPTY_RESULT_ANSWER = "Aucun résultat ne correspond à votre question."
+
+
+def response_text(response):
+    """Return the text of an LLM response, whether it is a chat message or a plain value."""
+    return response.content if hasattr(response, "content") else response.get("content", response)
+
+
+def clean_sql(text):
+    """Strip Markdown fences and a leading 'SQLQuery:' label from generated SQL."""
+    text = text.strip()
+    text = re.sub(r"^```(?:sql)?\s*|\s*```$", "", text, flags=re.IGNORECASE)
+    text = re.sub(r"^SQLQuery:\s*", "", text, flags=re.IGNORECASE)
+    return text.strip()
+
+
+def build_sql_database(engine):
+    """
+    Build a SQLDatabase whose table descriptions are rendered once.
+
+    The descriptions are handed back to SQLDatabase as custom_table_info, so they are not
+    queried again for every question. Tables converted by this application are described with
+    the column profiles stored at conversion time instead of sample rows, so they are not
+    scanned at all; the other tables keep LangChain's sample rows.
+    """
+    tables = table_names(engine)
+    profiles = {table: read_profiles(engine, table) for table in tables}
+    reflected_db = SQLDatabase(engine, include_tables=tables)
+    if any(not table_profiles.empty for table_profiles in profiles.values()):
+        schema_db = SQLDatabase(engine, include_tables=tables, sample_rows_in_table_info=0)
+    else:
+        schema_db = reflected_db
+    custom_table_info = {
+        table: reflected_db.get_table_info([table]) if profiles[table].empty
+        else f"{schema_db.get_table_info([table])}\n\n{profile_comment(table, profiles[table])}"
+        for table in tables
+    }
+    return SQLDatabase(engine, include_tables=tables, custom_table_info=custom_table_info)
+
+
+def generate_sql(llm, question, table_info, metrics=None):
+    """
+    Generate the SQL query answering a question, with a single LLM call.
+
+    Args:
+        llm: LangChain chat model.
+        question (str): Question asked by the user.
+        table_info (str): Schema description of the database.
+        metrics (dict): Instrumentation record receiving the prompt and completion tokens.
+
+    Returns:
+        str: The SQL query.
+    """
+    response = llm.invoke(SQL_PROMPT.format(input=question, table_info=table_info))
+    add_token_usage(metrics, response)
+    return clean_sql(response_text(response))
+
+
+async def agenerate_sql(llm, question, table_info, metrics=None):
+    """Asynchronous `generate_sql`, for running many questions concurrently."""
+    response = await llm.ainvoke(SQL_PROMPT.format(input=question, table_info=table_info))
+    add_token_usage(metrics, response)
+    return clean_sql(response_text(response))
+
+
+def execute_sql(sql, engine):
+    """
+    Run the SQL query once through the guarded executor.
+
+    Returns:
+        tuple: The result as a DataFrame, and True if it was truncated by the row cap.
+    """
+    return guarded_execute(sql, engine)
+
+
+def answer_prompt(question, result, token_budget=None, truncated=False):
+    """
+    Format the answer prompt for a question and its query result.
+
+    Large results are compacted to leading rows plus summary statistics within `token_budget`.
+    """
+    query_result = compact_result(result, token_budget)
+    if truncated:
+        query_result = f"(Result truncated to its first {len(result)} rows.)\n{query_result}"
+    return ANSWER_PROMPT.format(input=question, query_result=query_result)
+
+
+def answer_question(llm, question, result, truncated=False, metrics=None):
+    """
+    Phrase the answer in French from the query result, with at most one LLM call.
+
+    Returns:
+        str: The answer; an empty result is answered without calling the LLM.
+    """
+    if result.empty:
+        return EMPTY_RESULT_ANSWER
+    token_budget = answer_token_budget(getattr(llm, "max_tokens", None) or 4000)
+    response = llm.invoke(answer_prompt(question, result, token_budget, truncated))
+    add_token_usage(metrics, response)
+    return response_text(response)
+
+
+async def aanswer_question(llm, question, result, truncated=False, metrics=None):
+    """Asynchronous `answer_question`, for running many questions concurrently."""
+    if result.empty:
+        return EMPTY_RESULT_ANSWER
+    token_budget = answer_token_budget(getattr(llm, "max_tokens", None) or 4000)
+    response = await llm.ainvoke(answer_prompt(question, result, token_budget, truncated))
+    add_token_usage(metrics, response)
+    return response_text(response)
+
+
+def stream_answer(llm, question, result, truncated=False, metrics=None):
+    """
+    Phrase the answer in French like `answer_question`, yielding the text as the tokens arrive.
+
+    Yields:
+        str: Successive pieces of the answer.
+    """
+    if result.empty:
+        yield EMPTY_RESULT_ANSWER
+        return
+    token_budget = answer_token_budget(getattr(llm, "max_tokens", None) or 4000)
+    for chunk in llm.stream(answer_prompt(question, result, token_budget, truncated)):
+        # With stream_usage enabled, the token counts come with the last chunk
+        add_token_usage(metrics, chunk)
+        text = response_text(chunk)
+        if text:
+            yield text
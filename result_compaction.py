@@ -0,0 +1,118 @@
+import pandas as pd
+
+# Rough number of characters per token for tabular text
+CHARS_PER_TOKEN = 4
+
+# Context window of the answer model and tokens kept for the prompt instructions and question
+CONTEXT_WINDOW_TOKENS = 128000
+PROMPT_RESERVE_TOKENS = 1000
+
+# Upper bound on the result tokens sent to the LLM; answer latency grows with the prompt size
+LATENCY_CAP_TOKENS = 3000
+
+# Never send more rows than this verbatim, whatever the budget
+MAX_SAMPLE_ROWS = 50
+
+# Number of most frequent values listed for non-numeric columns
+TOP_K = 5
+
+# Longest rendering of a single value in the summary; longer values are cut
+MAX_VALUE_CHARS = 40
+
+
+def estimate_tokens(text):
+    """Estimate the number of tokens of a text."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def answer_token_budget(max_output_tokens=4000):
+    """
+    Choose how many tokens of query result the answer prompt may hold.
+
+    The budget is what the context window leaves once the output and the prompt are
+    accounted for, capped so that the answer latency does not grow with the result.
+    """
+    available = CONTEXT_WINDOW_TOKENS - max_output_tokens - PROMPT_RESERVE_TOKENS
+    return max(PROMPT_RESERVE_TOKENS, min(LATENCY_CAP_TOKENS, available))
+
+
+def compact_result(result, token_budget=None):
+    """
+    Render a query result for the answer prompt within a token budget.
+
+    Small results are rendered in full. Larger ones are reduced to as many leading rows
+    as fit in the budget, followed by summary statistics computed over every row.
+
+    Args:
+        result (pd.DataFrame): Result of the SQL query.
+        token_budget (int): Maximum number of tokens of the rendered text.
+
+    Returns:
+        str: Text to put in the answer prompt.
+    """
+    if token_budget is None:
+        token_budget = answer_token_budget()
+
+    if len(result) <= MAX_SAMPLE_ROWS:
+        text = result.to_string(index=False)
+        if estimate_tokens(text) <= token_budget:
+            return text
+
+    summary = f"Summary of all {len(result)} rows:\n" + summarize_result(result, token_budget=token_budget)
+    lines = result.head(MAX_SAMPLE_ROWS).to_string(index=False).splitlines()
+    # Keep the header line plus the rows that fit in what the summary leaves
+    remaining_chars = max(token_budget - estimate_tokens(summary), 0) * CHARS_PER_TOKEN
+    used_chars = len(lines[0]) + 1
+    if used_chars > remaining_chars:
+        return summary  # Too wide for even the header line
+    kept = 1
+    while kept < len(lines) and used_chars + len(lines[kept]) + 1 <= remaining_chars:
+        used_chars += len(lines[kept]) + 1
+        kept += 1
+
+    sample = "\n".join(lines[:kept])
+    return f"First {kept - 1} of {len(result)} rows:\n{sample}\n\n{summary}"
+
+
+def summarize_result(result, top_k=TOP_K, token_budget=None):
+    """
+    Summarize the columns of a result with vectorized pandas aggregations.
+
+    Numeric columns get their count, total, min, max and mean; other columns their
+    non-null count, distinct count and most frequent values. Columns are summarized in
+    order until the summary reaches `token_budget`; the ones left out are only counted.
+
+    Columns are looked up by position, as joins often return several columns with the same
+    name (`SELECT a.id, b.id ...`).
+    """
+    lines = [f"Rows: {len(result)}"]
+    remaining_chars = None if token_budget is None else token_budget * CHARS_PER_TOKEN - len(lines[0])
+    by_position = result.set_axis(range(len(result.columns)), axis="columns")
+    numeric = by_position.select_dtypes(include="number")
+    stats = numeric.agg(["count", "sum", "min", "max", "mean"]) if not numeric.empty else pd.DataFrame()
+
+    for position, column in enumerate(result.columns):
+        if position in stats.columns:
+            column_stats = stats[position]
+            line = (
+                f"{column}: count={int(column_stats['count'])}, total={column_stats['sum']:.6g}, "
+                f"min={column_stats['min']:.6g}, max={column_stats['max']:.6g}, mean={column_stats['mean']:.6g}"
+            )
+        else:
+            counts = by_position[position].value_counts(dropna=True)
+            top_values = ", ".join(
+                f"{str(value)[:MAX_VALUE_CHARS]} ({count})" for value, count in counts.head(top_k).items()
+            )
+            line = (
+                f"{column}: non-null={int(by_position[position].count())}, distinct={len(counts)}, "
+                f"top {top_k}: {top_values}"
+            )
+        if remaining_chars is not None:
+            # Room is kept for the line counting the columns left out
+            omitted = f"{len(result.columns) - position} more columns not summarized"
+            if len(line) + 1 > remaining_chars - len(omitted) - 1:
+                lines.append(omitted)
+                break
+            remaining_chars -= len(line) + 1
+        lines.append(line)
+    return "\n".join(lines)
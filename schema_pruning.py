@@ -0,0 +1,135 @@
+import json
+import math
+import re
+from collections import Counter
+
+from sqlalchemy import inspect
+
+from column_profiles import read_profiles
+from sql_cache import normalize_question
+
+# Number of tables described to the LLM for each question
+SCHEMA_TOP_K = 5
+
+# Rows sampled per table to index the values it holds
+SAMPLE_ROWS = 100
+
+# Weight of the terms found in table names, column names and sampled values
+FIELD_WEIGHTS = {"table": 3.0, "column": 2.0, "value": 1.0}
+
+
+def tokenize(text):
+    """
+    Split a text into normalized terms: lower case, no accents, split on punctuation and
+    underscores, with a trailing plural 's' or 'x' removed.
+    """
+    terms = []
+    for term in re.split(r"[^0-9a-z]+", normalize_question(str(text))):
+        if len(term) < 2:
+            continue
+        if len(term) > 3 and term[-1] in "sx":
+            term = term[:-1]
+        terms.append(term)
+    return terms
+
+
+def sample_values(engine, table, rows=SAMPLE_ROWS):
+    """
+    Text of the values of a table: the most frequent values of its stored column profiles, or
+    otherwise the values of its first `rows` rows.
+    """
+    profiles = read_profiles(engine, table)
+    if not profiles.empty:
+        return [str(value) for top_values in profiles["top_values"].dropna()
+                for value, _ in json.loads(top_values)]
+    quoted_table = engine.dialect.identifier_preparer.quote(table)
+    with engine.connect() as conn:
+        result = conn.exec_driver_sql(f"SELECT * FROM {quoted_table} LIMIT {rows}")
+        return [value for row in result for value in row if isinstance(value, str)]
+
+
+def build_schema_index(db, engine, sample_rows=SAMPLE_ROWS):
+    """
+    Build a TF-IDF index of the tables of a database.
+
+    Each table is a document made of the terms of its name, of its column names and of the
+    text values of its first rows, weighted by FIELD_WEIGHTS.
+
+    Args:
+        db (SQLDatabase): LangChain database, for the usable table names.
+        engine (sqlalchemy.engine.Engine): Engine the columns and values are read with.
+        sample_rows (int): Number of rows sampled per table.
+
+    Returns:
+        dict: "idf" (term -> inverse document frequency) and "vectors" (table -> normalized
+            term weights).
+    """
+    inspector = inspect(engine)
+    term_counts = {}
+    for table in db.get_usable_table_names():
+        counts = Counter()
+        for term in tokenize(table):
+            counts[term] += FIELD_WEIGHTS["table"]
+        for column in inspector.get_columns(table):
+            for term in tokenize(column["name"]):
+                counts[term] += FIELD_WEIGHTS["column"]
+        for value in sample_values(engine, table, sample_rows):
+            for term in tokenize(value):
+                counts[term] += FIELD_WEIGHTS["value"]
+        term_counts[table] = counts
+
+    documents = len(term_counts)
+    document_frequency = Counter(term for counts in term_counts.values() for term in counts)
+    idf = {term: math.log((1 + documents) / (1 + frequency)) + 1 for term, frequency in document_frequency.items()}
+
+    vectors = {}
+    for table, counts in term_counts.items():
+        # Sublinear term frequency, so that a value repeated in every sampled row does not dominate
+        weights = {term: (1 + math.log(count)) * idf[term] for term, count in counts.items()}
+        norm = math.sqrt(sum(weight * weight for weight in weights.values())) or 1.0
+        vectors[table] = {term: weight / norm for term, weight in weights.items()}
+    return {"idf": idf, "vectors": vectors}
+
+
+def rank_tables(index, question):
+    """Score every table by the cosine similarity of its terms with the question's, best first."""
+    query = Counter(term for term in tokenize(question) if term in index["idf"])
+    query_weights = {term: (1 + math.log(count)) * index["idf"][term] for term, count in query.items()}
+    scores = {
+        table: sum(weight * vector.get(term, 0.0) for term, weight in query_weights.items())
+        for table, vector in index["vectors"].items()
+    }
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+def prune_schema(db, index, question, top_k=SCHEMA_TOP_K, record=None):
+    """
+    Describe to the LLM only the tables most relevant to a question.
+
+    Databases with at most `top_k` tables, and questions sharing no term with any table, keep
+    the full schema.
+
+    Args:
+        db (SQLDatabase): LangChain database, whose table filtering renders the kept tables.
+        index (dict): Index built by `build_schema_index`.
+        question (str): Question asked by the user.
+        top_k (int): Number of tables kept.
+        record (dict): Instrumentation record receiving the pruning decision.
+
+    Returns:
+        str: The table_info of the kept tables.
+    """
+    ranking = rank_tables(index, question)
+    relevant = [table for table, score in ranking if score > 0]
+    kept = relevant[:top_k] if len(ranking) > top_k and relevant else [table for table, _ in ranking]
+    table_info = db.get_table_info(kept)
+    if record is not None:
+        record.update({
+            "tables_total": len(ranking),
+            "tables_kept": len(kept),
+            "top_k": top_k,
+            "kept": kept,
+            "scores": {table: round(score, 4) for table, score in ranking[:2 * top_k]},
+            "table_info_chars": len(table_info),
+        })
+    return table_info
@@ -0,0 +1,130 @@
+import hashlib
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+
+# SQLite file holding the generated SQL, separate from the analysed databases
+SQL_CACHE_PATH = "data/sql_cache.sqlite"
+
+# Entries older than this are regenerated
+SQL_CACHE_TTL_SECONDS = 7 * 24 * 3600
+
+# Least recently used entries beyond this count are evicted
+SQL_CACHE_MAX_ENTRIES = 5000
+
+
+def normalize_question(question):
+    """
+    Normalize a question so that trivial variations share a cache entry.
+
+    Case, accents, surrounding punctuation and repeated whitespace are ignored.
+    """
+    question = unicodedata.normalize("NFKD", question)
+    question = "".join(char for char in question if not unicodedata.combining(char))
+    question = re.sub(r"\s+", " ", question.lower()).strip()
+    return question.strip(" ?!.;:")
+
+
+def schema_hash(table_info):
+    """Hash of the schema description handed to the LLM."""
+    return hashlib.sha256(table_info.encode("utf-8")).hexdigest()
+
+
+def question_key(question, schema_digest):
+    """Cache key of a question asked against a given schema."""
+    payload = f"{schema_digest}\n{normalize_question(question)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def connect(db_path=SQL_CACHE_PATH):
+    """Open the cache database, creating it, its directory and its tables if needed."""
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS sql_cache (
+            key TEXT PRIMARY KEY,
+            question TEXT,
+            schema_hash TEXT,
+            sql TEXT,
+            created_at REAL,
+            last_used REAL,
+            hits INTEGER DEFAULT 0
+        )"""
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sql_cache_last_used ON sql_cache (last_used)")
+    conn.execute("CREATE TABLE IF NOT EXISTS sql_cache_stats (counter TEXT PRIMARY KEY, value INTEGER)")
+    return conn
+
+
+def lookup_sql(question, schema_digest, ttl=SQL_CACHE_TTL_SECONDS, db_path=SQL_CACHE_PATH):
+    """
+    Return the cached SQL for a question, or None on a miss.
+
+    Args:
+        question (str): Question asked by the user.
+        schema_digest (str): Hash of the schema the SQL was generated for.
+        ttl (float): Maximum age of an entry, in seconds.
+        db_path (str): Path of the cache database.
+
+    Returns:
+        str: The cached SQL query, or None.
+    """
+    key = question_key(question, schema_digest)
+    now = time.time()
+    conn = connect(db_path)
+    try:
+        row = conn.execute("SELECT sql, created_at FROM sql_cache WHERE key = ?", (key,)).fetchone()
+        if row is not None and now - row[1] > ttl:
+            conn.execute("DELETE FROM sql_cache WHERE key = ?", (key,))
+            row = None
+        if row is None:
+            increment_counter(conn, "misses")
+            conn.commit()
+            return None
+        conn.execute("UPDATE sql_cache SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key))
+        increment_counter(conn, "hits")
+        conn.commit()
+        return row[0]
+    finally:
+        conn.close()
+
+
+def store_sql(question, schema_digest, sql, max_entries=SQL_CACHE_MAX_ENTRIES, db_path=SQL_CACHE_PATH):
+    """Store the SQL generated for a question and evict the least recently used entries."""
+    now = time.time()
+    conn = connect(db_path)
+    try:
+        conn.execute(
+            "INSERT OR REPLACE INTO sql_cache (key, question, schema_hash, sql, created_at, last_used, hits) "
+            "VALUES (?, ?, ?, ?, ?, ?, 0)",
+            (question_key(question, schema_digest), normalize_question(question), schema_digest, sql, now, now),
+        )
+        conn.execute(
+            "DELETE FROM sql_cache WHERE key NOT IN (SELECT key FROM sql_cache ORDER BY last_used DESC LIMIT ?)",
+            (max_entries,),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def increment_counter(conn, counter):
+    """Add one to a hit/miss counter."""
+    conn.execute(
+        "INSERT INTO sql_cache_stats (counter, value) VALUES (?, 1) "
+        "ON CONFLICT(counter) DO UPDATE SET value = value + 1",
+        (counter,),
+    )
+
+
+def cache_stats(db_path=SQL_CACHE_PATH):
+    """Return the hit/miss counters and the number of cached entries."""
+    conn = connect(db_path)
+    try:
+        stats = dict(conn.execute("SELECT counter, value FROM sql_cache_stats").fetchall())
+        entries = conn.execute("SELECT COUNT(*) FROM sql_cache").fetchone()[0]
+    finally:
+        conn.close()
+    return {"hits": stats.get("hits", 0), "misses": stats.get("misses", 0), "entries": entries}
@@ -0,0 +1,233 @@
+import re
+import sqlite3
+import time
+
+import pandas as pd
+
+# Wall-clock limit of a generated query
+QUERY_TIMEOUT_SECONDS = 30
+
+# Rows returned at most; larger results are truncated and flagged
+MAX_RESULT_ROWS = 100000
+
+# Number of SQLite VM instructions between two checks of the deadline
+PROGRESS_HANDLER_STEPS = 10000
+
+# Cartesian products of full scans estimated above this many row combinations are rejected
+MAX_CARTESIAN_ROWS = 10000000
+
+# EXPLAIN QUERY PLAN detail of a full scan, of a table or of one of its covering indexes
+FULL_SCAN_PATTERN = r"SCAN (\w+)(?: USING COVERING INDEX \w+)?"
+
+# Number of times each guard tripped since the process started
+GUARD_METRICS = {"rejected_plans": 0, "timeouts": 0, "cancellations": 0, "truncations": 0}
+
+
+class QueryRejected(Exception):
+    """Raised when the plan of a generated query is too expensive to run."""
+
+
+class QueryTimeout(Exception):
+    """Raised when a generated query exceeds its time limit or is cancelled."""
+
+
+def guarded_execute(sql, engine, timeout=QUERY_TIMEOUT_SECONDS, max_rows=MAX_RESULT_ROWS, cancel_event=None):
+    """
+    Execute LLM-generated SQL with a plan check, a wall-clock timeout and a row cap.
+
+    On SQLite, the plan is checked with EXPLAIN QUERY PLAN first, and a progress handler
+    aborts the query once the deadline passes or `cancel_event` is set.
+
+    Args:
+        sql (str): Query to execute.
+        engine (sqlalchemy.engine.Engine): Engine of the database.
+        timeout (float): Wall-clock limit in seconds.
+        max_rows (int): Maximum number of rows returned.
+        cancel_event (threading.Event): Set it to cancel the running query.
+
+    Returns:
+        tuple: The result as a DataFrame, and True if it was truncated to `max_rows`.
+    """
+    raw_conn = engine.raw_connection()
+    try:
+        driver_conn = raw_conn.driver_connection
+        is_sqlite = isinstance(driver_conn, sqlite3.Connection)
+        if is_sqlite:
+            check_query_plan(driver_conn, sql)
+            deadline = time.monotonic() + timeout
+
+            def progress_handler():
+                # A non-zero return value makes SQLite interrupt the statement
+                return (cancel_event is not None and cancel_event.is_set()) or time.monotonic() > deadline
+
+            driver_conn.set_progress_handler(progress_handler, PROGRESS_HANDLER_STEPS)
+
+        cursor = raw_conn.cursor()
+        try:
+            cursor.execute(sql)
+            # Rows are produced while they are fetched, so the handler also covers this step
+            rows = cursor.fetchmany(max_rows + 1)
+            columns = [description[0] for description in cursor.description or []]
+        except sqlite3.OperationalError as e:
+            if "interrupted" not in str(e):
+                raise
+            if cancel_event is not None and cancel_event.is_set():
+                GUARD_METRICS["cancellations"] += 1
+                raise QueryTimeout("Requête annulée.") from e
+            GUARD_METRICS["timeouts"] += 1
+            raise QueryTimeout(f"La requête a dépassé le délai de {timeout} secondes.") from e
+        finally:
+            cursor.close()
+            if is_sqlite:
+                driver_conn.set_progress_handler(None, 0)
+    finally:
+        raw_conn.close()
+
+    truncated = len(rows) > max_rows
+    if truncated:
+        GUARD_METRICS["truncations"] += 1
+    return pd.DataFrame.from_records(rows[:max_rows], columns=columns), truncated
+
+
+def check_query_plan(conn, sql):
+    """
+    Reject queries whose plan multiplies full table scans into a large cartesian product.
+
+    Two or more full scans under the same parent of EXPLAIN QUERY PLAN form a nested loop
+    with no index to narrow it; their estimated row counts are multiplied and compared
+    with MAX_CARTESIAN_ROWS. CTEs and subqueries count the rows of what they read, see
+    `plan_row_estimates`, and a product involving a size that cannot be estimated is rejected.
+
+    Raises:
+        QueryRejected: If the estimated product is too large or cannot be estimated.
+    """
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+    estimate = plan_row_estimates(conn, plan, table_aliases(sql))
+    full_scans = {}
+    for _, parent, _, detail in plan:
+        match = re.fullmatch(FULL_SCAN_PATTERN, detail)
+        if match:
+            full_scans.setdefault(parent, []).append(match.group(1))
+
+    for names in full_scans.values():
+        if len(names) < 2:
+            continue
+        row_counts = [estimate(name) for name in names]
+        if None in row_counts:
+            GUARD_METRICS["rejected_plans"] += 1
+            raise QueryRejected(
+                f"Requête refusée: produit cartésien sans index entre {', '.join(names)}, "
+                f"dont la taille ne peut pas être estimée."
+            )
+        combinations = 1
+        for row_count in row_counts:
+            combinations *= row_count
+        if combinations > MAX_CARTESIAN_ROWS:
+            GUARD_METRICS["rejected_plans"] += 1
+            raise QueryRejected(
+                f"Requête refusée: produit cartésien sans index entre {', '.join(names)} "
+                f"(environ {combinations:,} combinaisons de lignes)."
+            )
+
+
+def plan_row_estimates(conn, plan, aliases):
+    """
+    Build the row count estimator of the names a query plan scans.
+
+    A name is a table, an alias of one, or a CTE or subquery the plan materializes. The latter
+    count as many rows as the tables they read put together: filters and aggregations only
+    shrink them, and a join inside them is checked as its own product. Recursive CTEs have no
+    estimate.
+
+    Args:
+        conn (sqlite3.Connection): Connection on the queried database.
+        plan (list): Rows of EXPLAIN QUERY PLAN.
+        aliases (dict): Aliases of the query, from `table_aliases`.
+
+    Returns:
+        callable: Function name -> estimated row count, or None when it cannot be estimated.
+    """
+    children = {}
+    materialized = {}
+    for node, parent, _, detail in plan:
+        children.setdefault(parent, []).append((node, detail))
+        match = re.fullmatch(r"(?:MATERIALIZE|CO-ROUTINE) (\w+)", detail)
+        if match:
+            materialized[match.group(1).lower()] = node
+
+    def subtree_estimate(node):
+        row_counts = []
+        for child, detail in children.get(node, []):
+            scan = re.fullmatch(FULL_SCAN_PATTERN, detail)
+            search = re.match(r"SEARCH (\w+)", detail)
+            values = re.fullmatch(r"SCAN (\d+)-ROW VALUES CLAUSE", detail)
+            if detail == "RECURSIVE STEP":
+                return None
+            if scan:
+                row_counts.append(estimate(scan.group(1)))
+            elif search:
+                row_counts.append(search_row_estimate(conn, aliases.get(search.group(1).lower(), search.group(1)),
+                                                      detail))
+            elif values:
+                row_counts.append(int(values.group(1)))
+            elif detail == "SCAN CONSTANT ROW":
+                row_counts.append(1)
+            elif child not in materialized.values():
+                row_counts.append(subtree_estimate(child))
+        if None in row_counts:
+            return None
+        return max(sum(row_counts), 1)
+
+    def estimate(name):
+        table = aliases.get(name.lower(), name)
+        if table.lower() in materialized:
+            return subtree_estimate(materialized[table.lower()])
+        return estimate_row_count(conn, table)
+
+    return estimate
+
+
+def table_aliases(sql):
+    """Map the aliases of the FROM/JOIN clauses of a query to their table names."""
+    aliases = {}
+    pattern = r'(?:from|join|,)\s+"?(\w+)"?\s+(?:as\s+)?"?(\w+)"?'
+    for table, alias in re.findall(pattern, sql, flags=re.IGNORECASE):
+        if alias.lower() not in ("where", "on", "join", "inner", "left", "cross", "group", "order", "limit", "using"):
+            aliases[alias.lower()] = table
+    return aliases
+
+
+def estimate_row_count(conn, table):
+    """
+    Cheap estimate of the row count of a table, from its largest rowid.
+
+    Returns None for names that are not tables.
+    """
+    try:
+        count = conn.execute(f'SELECT MAX(rowid) FROM "{table}"').fetchone()[0]
+    except sqlite3.Error:
+        return None
+    return count or 1
+
+
+def search_row_estimate(conn, table, detail):
+    """
+    Estimate the rows an index lookup of a query plan returns.
+
+    Equality lookups use the rows per key that ANALYZE recorded in sqlite_stat1; other lookups
+    count as the whole table.
+    """
+    if "(rowid=?)" in detail:
+        return 1
+    match = re.search(r"USING (?:COVERING )?INDEX (\w+) \((.*)\)", detail)
+    if match:
+        equalities = len(re.findall(r"=\?", match.group(2)))
+        try:
+            stat = conn.execute("SELECT stat FROM sqlite_stat1 WHERE idx = ?", (match.group(1),)).fetchone()
+        except sqlite3.Error:
+            stat = None  # Not analyzed
+        if stat and equalities:
+            rows_per_key = stat[0].split()[1:]
+            if len(rows_per_key) >= equalities:
+                return int(rows_per_key[equalities - 1])
+    return estimate_row_count(conn, table)
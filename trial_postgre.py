@@ -4,6 +4,9 @@ import pandas as pd
 from dotenv import load_dotenv, find_dotenv
 from sqlalchemy import create_engine
 
+from postgres_extract import extract_incremental
+from prefix_join import materialize_prefix_join
+
 # Load environment variables from .env file
 load_dotenv(find_dotenv())
 
@@ -24,22 +27,14 @@ uri = f"{db_type}://{username}:{password}@{hostname}:{port}/{database}"
 # 1. Connect to PostgreSQL
 engine = create_engine(uri)
 
-# 2. Create a table from Appro limited in time
-select_query = """
-SELECT cetab, ltie, qterec1, daterec
-FROM dafacd
-WHERE daterec >= '2024-01-02' 
-AND daterec <= '2024-08-31';
-"""
-
-# Execute the query and store the result in a DataFrame
-df = pd.read_sql_query(select_query, engine)
-print("Data from dafacd:")
-print(df)
+# SQLite database receiving the extracted tables
+SQLITE_PATH = r'C:/Users/bob/PycharmProjects/BABot/sqlitedb/temp.db'
+sqlite_engine = create_engine(f'sqlite:///{SQLITE_PATH}', echo=False)
 
-# Create an in-memory SQLite database and write the DataFrame to it
-sqlite_engine = create_engine(r'sqlite:///C:/Users/bob/PycharmProjects/BABot/sqlitedb/temp.db', echo=False)
-df.to_sql('Appro', sqlite_engine, index=False, if_exists='replace')
+# 2. Create the Appro table from dafacd, then only append the rows received since the previous run
+row_count = extract_incremental(engine, SQLITE_PATH, 'Appro', 'dafacd', ['cetab', 'ltie', 'qterec1', 'daterec'],
+                                'daterec', start='2024-01-02')
+print(f"{row_count} new rows from dafacd")
 
 # 3. Create a 2nd table with the names of the Group suppliers
 select_query = """
@@ -55,18 +50,11 @@ print(df)
 df.to_sql('Groupe', sqlite_engine, index=False, if_exists='replace')
 
 # 4. Create a 3rd table with the Appro table filtered by Group suppliers
-select_query = """
-SELECT Appro.cetab, Appro.ltie, Appro.qterec1, Appro.daterec
-FROM Appro
-INNER JOIN Groupe
-ON Appro.ltie LIKE Groupe.lvniv1 || '%';
-"""
-
-# Execute the query and store the result in a DataFrame using the SQLite engine
-df = pd.read_sql_query(select_query, sqlite_engine)
+# Same rows as "INNER JOIN Groupe ON Appro.ltie LIKE Groupe.lvniv1 || '%'", matched in one pass over Appro
+df = materialize_prefix_join(sqlite_engine, 'InnerJoin', 'Appro', ['cetab', 'ltie', 'qterec1', 'daterec'],
+                             'ltie', 'Groupe', 'lvniv1')
 print("Appro data filtered by Group suppliers:")
 print(df)
-df.to_sql('InnerJoin', sqlite_engine, index=False, if_exists='replace')
 
 # 4. Create a 4th table with the InnerJoin table filtered by Group suppliers
 select_query = """
@@ -0,0 +1,135 @@
+import os
+import shutil
+import threading
+import time
+import uuid
+
+# Parent directory of the per-session workspaces
+WORKSPACES_DIR = "data/workspaces"
+
+# Size budget shared by all workspaces; the least recently used idle ones are evicted beyond it
+MAX_WORKSPACES_BYTES = 5 * 1024 * 1024 * 1024
+
+# Workspaces unused for this long belong to expired sessions and are removed
+WORKSPACE_IDLE_SECONDS = 2 * 3600
+
+# Workspaces used more recently than this are never evicted to meet the quota
+ACTIVE_GRACE_SECONDS = 10 * 60
+
+# Time between two runs of the background cleanup
+CLEANUP_INTERVAL_SECONDS = 10 * 60
+
+# File whose modification time records the last use of a workspace
+LAST_USED_MARKER = ".last_used"
+
+
+def create_workspace(root=WORKSPACES_DIR):
+    """Create the private directory of a new session and return its path."""
+    path = os.path.join(root, uuid.uuid4().hex)
+    os.makedirs(path)
+    touch_workspace(path)
+    return path
+
+
+def touch_workspace(path):
+    """
+    Record that a session is using its workspace, recreating the directory if it was evicted.
+    """
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, LAST_USED_MARKER), "a"):
+        pass
+    os.utime(os.path.join(path, LAST_USED_MARKER))
+
+
+def last_used(path):
+    """Time of the last use of a workspace, or its own modification time if it has no marker."""
+    marker = os.path.join(path, LAST_USED_MARKER)
+    return os.path.getmtime(marker if os.path.exists(marker) else path)
+
+
+def directory_size(path):
+    """Total size in bytes of the files below a directory."""
+    size = 0
+    for directory, _, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.path.getsize(os.path.join(directory, name))
+            except OSError:
+                continue  # Removed while walking
+    return size
+
+
+def list_workspaces(root=WORKSPACES_DIR):
+    """Return (last used, size, path) of every workspace, least recently used first."""
+    if not os.path.isdir(root):
+        return []
+    workspaces = []
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if os.path.isdir(path):
+            workspaces.append((last_used(path), directory_size(path), path))
+    return sorted(workspaces)
+
+
+def remove_workspace(path):
+    """Delete a workspace; files still open by a query are left for the next cleanup."""
+    shutil.rmtree(path, ignore_errors=True)
+
+
+def cleanup_workspaces(root=WORKSPACES_DIR, max_bytes=MAX_WORKSPACES_BYTES, idle_seconds=WORKSPACE_IDLE_SECONDS,
+                       keep=None):
+    """
+    Remove the workspaces of expired sessions, then evict the least recently used idle
+    workspaces until all of them fit in `max_bytes`.
+
+    Args:
+        root (str): Parent directory of the workspaces.
+        max_bytes (int): Size budget of all the workspaces.
+        idle_seconds (float): Idle time after which a session is considered expired.
+        keep (str): Workspace never removed, typically the caller's own.
+
+    Returns:
+        list: Paths of the removed workspaces.
+    """
+    now = time.time()
+    removed = []
+    workspaces = []
+    for used_at, size, path in list_workspaces(root):
+        if path != keep and now - used_at > idle_seconds:
+            remove_workspace(path)
+            removed.append(path)
+        else:
+            workspaces.append((used_at, size, path))
+
+    total_bytes = sum(size for _, size, _ in workspaces)
+    for used_at, size, path in workspaces:
+        if total_bytes <= max_bytes:
+            break
+        if path == keep or now - used_at < ACTIVE_GRACE_SECONDS:
+            continue
+        remove_workspace(path)
+        removed.append(path)
+        total_bytes -= size
+    return removed
+
+
+def start_cleanup_thread(interval=CLEANUP_INTERVAL_SECONDS, root=WORKSPACES_DIR):
+    """
+    Run `cleanup_workspaces` every `interval` seconds in a daemon thread.
+
+    Returns:
+        threading.Thread: The started thread.
+    """
+    def cleanup_loop():
+        while True:
+            try:
+                removed = cleanup_workspaces(root)
+                if removed:
+                    print(f"Removed {len(removed)} idle workspaces")
+            except Exception as e:
+                print(f"Error during workspace cleanup: {e}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=cleanup_loop, name="workspace-cleanup", daemon=True)
+    thread.start()
+    return thread